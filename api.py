@@ -8,10 +8,12 @@ from typing import Dict, List, Optional, Any
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 
+import orjson
+
 from chat_session import ChatSession
 from config import Configuration
 from context_manager import (
@@ -31,7 +33,7 @@ from tool_executor import ToolExecutor
 from intent_classifier import is_conceptual_question, get_topic_from_query, is_domain_relevant, is_complex_query
 from query_router import QueryRouter
 from llm_intent_classifier import classify_user_intent, get_intent_classifier
-from response_enricher import enrich_data_response
+from response_enricher import enrich_data_response_async, get_response_enricher
 from learning_memory import get_learning_memory, LearningMemory
 from web_search import WebSearchClient, WebSearchWithSerpAPI
 
@@ -152,7 +154,7 @@ async def lifespan(app: FastAPI):
         await chat_session.cleanup_servers()
 
 
-app = FastAPI(title="MCP Chatbot API", lifespan=lifespan)
+app = FastAPI(title="MCP Chatbot API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Configurar CORS para permitir requests del frontend
 app.add_middleware(
@@ -196,6 +198,7 @@ class ToolRequest(BaseModel):
     tool: str
     args: Optional[Dict] = {}
     session_id: Optional[str] = "default"
+    question: Optional[str] = None
 
 
 class ToolResponse(BaseModel):
@@ -337,6 +340,39 @@ async def tool_endpoint(tool_request: ToolRequest):
         )
 
 
+@app.post("/api/tool/stream")
+async def tool_stream_endpoint(tool_request: ToolRequest):
+    """
+    Ejecuta una herramienta y transmite la respuesta enriquecida por Server-Sent Events.
+    Cada evento tiene la forma `data: {"t": "<fragmento>"}`.
+    """
+    tool_name = tool_request.tool
+    args = tool_request.args or {}
+    
+    logging.info(f"Streaming tool execution: {tool_name} with args {args}")
+    
+    if not tool_executor or not tool_executor.is_available():
+        result = "Lo siento, las herramientas no están disponibles en este momento."
+    else:
+        try:
+            # La consulta a la base es bloqueante: no correrla en el event loop
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, tool_executor.execute, tool_name, args)
+        except Exception as e:
+            logging.error(f"Error executing tool {tool_name}: {e}")
+            result = "Lo siento, hubo un error al ejecutar la consulta."
+    
+    enricher = get_response_enricher()
+    # El cliente se pasa por llamada: el enriquecedor es global y compartido entre requests
+    openai_client = chat_session.openai_client if chat_session else None
+    
+    async def event_stream():
+        async for chunk in enricher.enrich_stream(result, tool_request.question or tool_name, openai_client):
+            yield b"data: " + orjson.dumps({"t": chunk}) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpoint(chat_message: ChatMessage):
     """Endpoint para enviar mensajes al chatbot."""
@@ -598,7 +634,7 @@ IMPORTANTE: Tu audiencia son ciudadanos comunes que buscan información estadís
                         result = tool_executor.execute(child_node.tool, child_node.tool_args or {})
                         # Enriquecer respuesta si hay cliente LLM
                         if chat_session and chat_session.openai_client:
-                            result = enrich_data_response(result, child_node.title or user_input, chat_session.openai_client)
+                            result = await enrich_data_response_async(result, child_node.title or user_input, chat_session.openai_client)
                         chat_messages[session_id].append({"role": "user", "content": user_input})
                         chat_messages[session_id].append({"role": "assistant", "content": result})
                         return ChatResponse(response=result, session_id=session_id, tool=child_node.tool)
@@ -629,7 +665,7 @@ IMPORTANTE: Tu audiencia son ciudadanos comunes que buscan información estadís
                     result = tool_executor.execute(matched_menu_node.tool, matched_menu_node.tool_args or {})
                     # Enriquecer respuesta con contexto usando LLM si está disponible
                     if chat_session and chat_session.openai_client:
-                        result = enrich_data_response(result, user_input, chat_session.openai_client)
+                        result = await enrich_data_response_async(result, user_input, chat_session.openai_client)
                     chat_messages[session_id].append({"role": "user", "content": user_input})
                     chat_messages[session_id].append({"role": "assistant", "content": result})
                     return ChatResponse(response=result, session_id=session_id, tool=matched_menu_node.tool)
@@ -861,7 +897,7 @@ Puedo ayudarte con:
                     
                     # Enriquecer respuesta con contexto usando LLM si está disponible
                     if llm_client_for_intent:
-                        response = enrich_data_response(response, user_input, llm_client_for_intent)
+                        response = await enrich_data_response_async(response, user_input, llm_client_for_intent)
                     
                     chat_messages[session_id].append({"role": "user", "content": user_input})
                     chat_messages[session_id].append({"role": "assistant", "content": response})
@@ -986,7 +1022,7 @@ NO muestres datos numéricos a menos que el usuario los pida explícitamente des
                     
                     # Enriquecer respuesta con contexto usando LLM si está disponible
                     if chat_session and chat_session.openai_client:
-                        result = enrich_data_response(result, user_input, chat_session.openai_client)
+                        result = await enrich_data_response_async(result, user_input, chat_session.openai_client)
                     
                     chat_messages[session_id].append({"role": "user", "content": user_input})
                     chat_messages[session_id].append({"role": "assistant", "content": result})
@@ -1,10 +1,11 @@
 """Clasificador de intención para distinguir preguntas conceptuales de solicitudes de datos."""
 import re
+from functools import lru_cache
 from typing import Tuple
 
 
 # Términos del dominio IPECD (estadísticas, economía, demografía)
-DOMAIN_KEYWORDS = {
+DOMAIN_KEYWORDS = frozenset({
     # Indicadores económicos
     'ipc', 'inflacion', 'inflación', 'precios', 'canasta', 'basica', 'básica',
     'dolar', 'dólar', 'blue', 'oficial', 'mep', 'ccl', 'cotizacion', 'cotización',
@@ -34,11 +35,11 @@ DOMAIN_KEYWORDS = {
     'corrientes', 'argentina', 'provincia', 'region', 'región', 'nea',
     # Términos del IPECD
     'ipecd', 'instituto', 'censos'
-}
+})
 
 
 # Palabras que parecen del dominio pero NO lo son (evitar falsos positivos)
-OUT_OF_DOMAIN_KEYWORDS = {
+OUT_OF_DOMAIN_KEYWORDS = frozenset({
     'salud', 'hospital', 'medico', 'médico', 'enfermedad', 'vacuna', 'covid',
     'educacion', 'educación', 'escuela', 'universidad', 'colegio',
     'clima', 'tiempo', 'temperatura', 'lluvia',
@@ -46,25 +47,26 @@ OUT_OF_DOMAIN_KEYWORDS = {
     'politica', 'política', 'presidente', 'gobernador', 'elecciones',
     'receta', 'cocina', 'comida',
     'pelicula', 'película', 'musica', 'música', 'serie'
-}
+})
 
 # Palabras genéricas que no cuentan como indicadores específicos
-GENERIC_WORDS = {
+GENERIC_WORDS = frozenset({
     'datos', 'informacion', 'información', 'dame', 'quiero', 'necesito',
     'mostrar', 'ver', 'buscar', 'consultar', 'ultimo', 'último', 'actual'
-}
+})
 
 # Indicadores específicos del IPECD (más peso que palabras genéricas)
-SPECIFIC_INDICATORS = {
+SPECIFIC_INDICATORS = frozenset({
     'ipc', 'dolar', 'dólar', 'empleo', 'desempleo', 'censo', 'poblacion', 'población',
     'inflacion', 'inflación', 'canasta', 'semaforo', 'semáforo', 'patentamiento',
     'aeropuerto', 'combustible', 'eph', 'sipa', 'ecv', 'oede', 'pbg', 'emae',
     'salario', 'salarios', 'smvm', 'ripte', 'supermercado', 'construccion', 'construcción',
     'ieric', 'ipicorr',
     'pobreza', 'indigencia', 'salario', 'trabajo', 'economico', 'económico'
-}
+})
 
 
+@lru_cache(maxsize=1024)
 def is_domain_relevant(query: str) -> bool:
     """
     Verifica si la consulta es relevante para el dominio del IPECD.
@@ -114,8 +116,9 @@ COMPLEX_QUERY_PATTERNS = [
     r'tendencia\w*',         # tendencia
 ]
 
-# Nombres de lugares que indican consulta específica (con variantes de tipeo comunes)
-LOCATION_NAMES = {
+# Nombres de lugares que indican consulta específica (con variantes de tipeo comunes).
+# Los conjuntos del módulo son frozenset: las funciones cacheadas dependen de que no cambien.
+LOCATION_NAMES = frozenset({
     # Municipios de Corrientes (con variantes)
     'goya', 'corrientes', 'corientes', 'corrientrs', 'ctes',
     'paso de los libres', 'mercedes', 'curuzú cuatiá', 'curuzu cuatia',
@@ -129,9 +132,10 @@ LOCATION_NAMES = {
     'formosa', 'jujuy', 'san juan', 'neuquén', 'neuquen',
     # Regiones
     'nea', 'noa', 'cuyo', 'patagonia', 'pampeana', 'gba'
-}
+})
 
 
+@lru_cache(maxsize=1024)
 def is_complex_query(query: str) -> bool:
     """
     Detecta si la consulta es compleja y requiere procesamiento directo con herramientas.
@@ -226,6 +230,7 @@ DATA_REQUEST_PATTERNS = [
 ]
 
 
+@lru_cache(maxsize=1024)
 def classify_intent(query: str) -> Tuple[str, float]:
     """
     Clasifica la intención del usuario.
@@ -274,6 +279,7 @@ def classify_intent(query: str) -> Tuple[str, float]:
         return "ambiguous", 0.5
 
 
+@lru_cache(maxsize=1024)
 def is_conceptual_question(query: str) -> bool:
     """
     Verifica si es una pregunta conceptual/definitoria.
@@ -288,6 +294,7 @@ def is_conceptual_question(query: str) -> bool:
     return intent_type == "conceptual" and confidence >= 0.4
 
 
+@lru_cache(maxsize=1024)
 def get_topic_from_query(query: str) -> str:
     """
     Extrae el tema principal de la consulta.
@@ -1,13 +1,152 @@
 """Sistema de memoria y aprendizaje para el chatbot usando MySQL."""
 import logging
 import re
+import threading
+import time
+import zlib
 from datetime import datetime
 from difflib import SequenceMatcher
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pymysql
 from pymysql.cursors import DictCursor
 
+# Patrones precompilados ligados a nombres globales. La normalización tiene que dar
+# exactamente lo mismo que la original: normalized_question ya está guardado en la DB
+# y la búsqueda exacta compara contra esa columna.
+_NON_WORD_SUB = re.compile(r'[^\w\s]').sub
+_WS_SUB = re.compile(r'\s+').sub
+
+# Solo los acentos en minúscula del español (se aplica después de lower())
+_ACCENTS = str.maketrans('áéíóúñü', 'aeiounu')
+
+# Candidatos del índice LSH que se traen de la DB y se puntúan (los de mayor Jaccard estimado)
+_LSH_MAX_CANDIDATES = 50
+# Cada cuánto (segundos) se consultan las filas que insertaron otros procesos
+_LSH_SYNC_INTERVAL = 30.0
+# Cada cuánto (segundos) se reconstruye el índice para descartar filas borradas o podadas
+_LSH_REBUILD_INTERVAL = 600.0
+
+# Texto vectorizado: (normalizado, palabras de contenido, máscara de términos clave)
+_Vector = Tuple[str, frozenset, int]
+
+
+@lru_cache(maxsize=4096)
+def _normalize_text_impl(text: str) -> str:
+    """Normaliza texto para comparación (función pura, cacheada)."""
+    text = _NON_WORD_SUB('', text.lower().strip())
+    text = _WS_SUB(' ', text).translate(_ACCENTS)
+    return text[:500]  # Limitar longitud para índice
+
+
+@lru_cache(maxsize=4096)
+def _generate_key_impl(question: str) -> str:
+    """Genera la clave de una pregunta (función pura, cacheada)."""
+    words = [w for w in _normalize_text_impl(question).split() if len(w) > 2][:5]
+    return '_'.join(words)[:100] if words else 'unknown'
+
+
+def _vectorize_impl(text: str) -> _Vector:
+    """Precalcula por texto lo que necesita la similitud (cacheado por texto, no por par)."""
+    return _vectorize_normalized(_normalize_text_impl(text))
+
+
+@lru_cache(maxsize=1024)
+def _vectorize_normalized(normalized: str) -> _Vector:
+    """Igual que `_vectorize_impl` para un texto ya normalizado (p. ej. el guardado en la DB)."""
+    words = set(normalized.split())
+    return normalized, frozenset(words - LearningMemory.STOP_WORDS), _key_mask(words)
+
+
+def _key_mask(words) -> int:
+    """Máscara de los términos clave presentes, en una sola pasada por las palabras.
+    
+    Compara palabras completas: "desempleo" no activa también "empleo".
+    """
+    bits_get = LearningMemory.KEY_TERM_BITS.get
+    return sum(bits_get(word, 0) for word in words)
+
+
+class _MinHashLSH:
+    """Índice LSH sobre firmas MinHash de 3-gramas de caracteres.
+    
+    Devuelve candidatos cuya similitud Jaccard de 3-gramas es probablemente
+    alta; la similitud exacta se calcula después sobre esos candidatos.
+    Con 21 bandas de 3 filas el umbral aproximado es (1/21)^(1/3) ≈ 0.36:
+    se siguen encontrando las paráfrasis sin traer media tabla como candidata.
+    """
+    
+    _PRIME = (1 << 31) - 1
+    
+    def __init__(self, num_perm: int = 64, bands: int = 21, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, self._PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, self._PRIME, num_perm, dtype=np.uint64)
+        self._rows = num_perm // bands
+        self._buckets: List[Dict[bytes, set]] = [{} for _ in range(bands)]
+        # Firma de cada clave: para quitarla del índice y estimar su Jaccard con la consulta
+        self._signatures: Dict[int, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return len(self._signatures)
+    
+    def signature(self, normalized: str) -> np.ndarray:
+        """Calcula la firma MinHash de un texto normalizado (no toca el índice)."""
+        padded = f" {normalized} "
+        shingles = {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles),
+                             dtype=np.uint64, count=len(shingles)) % self._PRIME
+        # Permutación (a*x + b) mod p para cada función hash; mínimo por función
+        signature = ((np.outer(self._a, hashes) + self._b[:, None]) % self._PRIME).min(axis=1)
+        return signature.astype(np.uint32)
+    
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """Parte la firma en bandas (las filas que sobran no forman banda)."""
+        rows = self._rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(len(self._buckets))]
+    
+    def insert(self, key: int, normalized: str, signature: Optional[np.ndarray] = None) -> None:
+        """Agrega (o reemplaza) un texto normalizado; la firma puede venir precalculada."""
+        if signature is None:
+            signature = self.signature(normalized)
+        self.remove(key)
+        self._signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, set()).add(key)
+    
+    def remove(self, key: int) -> None:
+        """Quita una clave del índice (p. ej. una fila borrada); no falla si no está."""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            keys = bucket.get(band_key)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[band_key]
+    
+    def query(self, normalized: str, limit: Optional[int] = None) -> List[int]:
+        """Retorna las claves candidatas, de mayor a menor Jaccard estimado.
+        
+        Args:
+            normalized: Texto normalizado de la consulta
+            limit: Máximo de candidatos (los de menor Jaccard estimado se descartan)
+        """
+        signature = self.signature(normalized)
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+        if not candidates:
+            return []
+        keys = list(candidates)
+        # Fracción de funciones hash con el mismo mínimo ≈ similitud Jaccard de 3-gramas
+        estimates = (np.stack([self._signatures[key] for key in keys]) == signature).mean(axis=1)
+        order = np.argsort(-estimates, kind="stable")[:limit]
+        return [keys[i] for i in order]
+
 
 class LearningMemory:
     """
@@ -16,22 +155,25 @@ class LearningMemory:
     """
     
     # Palabras comunes que no deben influir en la similitud
-    STOP_WORDS = {
+    STOP_WORDS = frozenset({
         'que', 'es', 'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'al',
         'en', 'por', 'para', 'con', 'sin', 'sobre', 'entre', 'como', 'cual',
         'donde', 'cuando', 'quien', 'cuanto', 'me', 'te', 'se', 'nos', 'les',
         'lo', 'le', 'y', 'o', 'a', 'e', 'u', 'pero', 'si', 'no', 'mas', 'muy',
         'tan', 'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas',
         'aquel', 'aquella', 'su', 'sus', 'mi', 'tu', 'ser', 'estar', 'tiene',
-        'significa', 'significa', 'quiere', 'decir', 'dame', 'dime', 'mostrar'
-    }
+        'significa', 'quiere', 'decir', 'dame', 'dime', 'mostrar'
+    })
     
     # Siglas y términos importantes que deben coincidir exactamente
-    KEY_TERMS = {
+    KEY_TERMS = frozenset({
         'ipc', 'eph', 'ecv', 'emae', 'sipa', 'oede', 'ripte', 'pbg', 'ipi',
         'dolar', 'blue', 'mep', 'ccl', 'oficial', 'censo', 'canasta', 'basica',
         'empleo', 'desempleo', 'inflacion', 'precios', 'salario', 'semaforo'
-    }
+    })
+    
+    # Un bit por término clave para comparar conjuntos de términos con enteros
+    KEY_TERM_BITS = {term: 1 << i for i, term in enumerate(sorted(KEY_TERMS))}
     
     # SQL para crear la tabla si no existe
     CREATE_TABLE_SQL = """
@@ -65,6 +207,13 @@ class LearningMemory:
         }
         self.database = database
         self.similarity_threshold = 0.80  # Aumentado para evitar falsos positivos
+        # Índice LSH en memoria para obtener candidatos sin escanear la tabla
+        self._lsh = _MinHashLSH()
+        self._lsh_max_id = 0
+        self._lsh_synced_at = 0.0
+        self._lsh_rebuild_at = 0.0  # La primera sincronización carga el índice completo
+        self._lsh_rebuilding = False
+        self._lsh_lock = threading.Lock()
         self._ensure_database_and_table()
     
     def _get_connection(self, use_database: bool = True):
@@ -96,63 +245,50 @@ class LearningMemory:
             logging.error(f"Error initializing learning memory database: {e}")
             raise
     
-    def _normalize_text(self, text: str) -> str:
-        """Normaliza texto para comparación."""
-        text = text.lower().strip()
-        text = re.sub(r'[^\w\s]', '', text)
-        text = re.sub(r'\s+', ' ', text)
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', 'ü': 'u'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text[:500]  # Limitar longitud para índice
+    # Normaliza texto para comparación (llama directo a la función cacheada)
+    _normalize_text = staticmethod(_normalize_text_impl)
+    
+    def _vectorize(self, text: str) -> _Vector:
+        """Retorna (texto normalizado, palabras de contenido, máscara de términos clave) del texto."""
+        return _vectorize_impl(text)
     
     def _calculate_similarity(self, text1: str, text2: str) -> float:
         """Calcula similitud entre dos textos, priorizando términos clave."""
-        norm1 = self._normalize_text(text1)
-        norm2 = self._normalize_text(text2)
-        
-        words1 = set(norm1.split())
-        words2 = set(norm2.split())
-        
-        # Extraer términos clave (siglas, términos importantes)
-        key_words1 = words1 & self.KEY_TERMS
-        key_words2 = words2 & self.KEY_TERMS
+        return self._similarity_from_vectors(self._vectorize(text1), self._vectorize(text2))
+    
+    def _similarity_from_vectors(self, vectorized1: _Vector, vectorized2: _Vector) -> float:
+        """Calcula la similitud a partir de dos textos ya vectorizados."""
+        norm1, content_words1, key_mask1 = vectorized1
+        norm2, content_words2, key_mask2 = vectorized2
         
         # Si ambos tienen términos clave diferentes, NO son similares
-        if key_words1 and key_words2 and key_words1 != key_words2:
+        if key_mask1 and key_mask2 and key_mask1 != key_mask2:
             return 0.0  # ECV != EPH, IPC != dolar, etc.
         
         # Si uno tiene término clave y el otro no lo tiene, baja similitud
-        if (key_words1 or key_words2) and key_words1 != key_words2:
+        if key_mask1 != key_mask2:
             return 0.3
         
-        # Remover stop words para comparación
-        content_words1 = words1 - self.STOP_WORDS
-        content_words2 = words2 - self.STOP_WORDS
+        # Similitud de secuencia (para frases similares)
+        seq_similarity = SequenceMatcher(None, norm1, norm2).ratio()
         
+        # Sin palabras de contenido (solo stop words) en alguno de los textos
         if not content_words1 or not content_words2:
-            return SequenceMatcher(None, norm1, norm2).ratio() * 0.5
+            return seq_similarity * 0.5
         
-        # Similitud basada en palabras de contenido
+        # Similitud basada en palabras de contenido (palabras exactas, sin hashing:
+        # con buckets colisionan palabras como enero/agosto o goya/esquina)
         common_content = content_words1 & content_words2
         content_similarity = len(common_content) / max(len(content_words1), len(content_words2))
         
-        # Similitud de secuencia (para frases similares)
-        seq_similarity = SequenceMatcher(None, norm1, norm2).ratio()
-        
         # Bonus si los términos clave coinciden
-        key_bonus = 0.3 if key_words1 and key_words1 == key_words2 else 0.0
+        key_bonus = 0.3 if key_mask1 else 0.0
         
         return min((content_similarity * 0.5) + (seq_similarity * 0.2) + key_bonus, 1.0)
     
     def _generate_key(self, question: str) -> str:
         """Genera una clave única para la pregunta."""
-        normalized = self._normalize_text(question)
-        words = [w for w in normalized.split() if len(w) > 2][:5]
-        return '_'.join(words)[:100] if words else 'unknown'
+        return _generate_key_impl(question)
     
     def find_similar(self, question: str, min_similarity: float = None) -> Optional[Tuple[int, Dict, float]]:
         """
@@ -179,29 +315,46 @@ class LearningMemory:
                     conn.close()
                     return (exact_match['id'], exact_match, 1.0)
                 
-                # Buscar candidatos con palabras similares
-                words = normalized.split()[:3]
-                if not words:
+                if not normalized:
                     conn.close()
                     return None
                 
-                # Construir búsqueda por palabras clave
-                like_conditions = " OR ".join(["normalized_question LIKE %s" for _ in words])
-                like_values = [f"%{w}%" for w in words]
+                # Buscar candidatos en el índice LSH (incorporando filas nuevas)
+                self._sync_lsh(cursor)
+                with self._lsh_lock:
+                    candidate_ids = self._lsh.query(normalized, _LSH_MAX_CANDIDATES)
+                if not candidate_ids:
+                    conn.close()
+                    return None
                 
+                # Se puntúan todos los candidatos traídos (ya vienen los de mayor Jaccard estimado)
+                placeholders = ", ".join(["%s"] * len(candidate_ids))
                 cursor.execute(
-                    f"SELECT * FROM chatbot_learned_responses WHERE {like_conditions} ORDER BY use_count DESC LIMIT 50",
-                    like_values
+                    f"SELECT * FROM chatbot_learned_responses WHERE id IN ({placeholders})",
+                    candidate_ids
                 )
                 candidates = cursor.fetchall()
             conn.close()
             
-            # Calcular similitud para cada candidato
+            # Candidatos que ya no están en la tabla (borrados o podados): sacarlos del índice
+            missing = set(candidate_ids).difference(candidate['id'] for candidate in candidates)
+            if missing:
+                with self._lsh_lock:
+                    for key in missing:
+                        self._lsh.remove(key)
+            
+            # Calcular similitud para cada candidato usando la pregunta ya normalizada en la DB
             best_match = None
             best_similarity = 0.0
+            question_vector = self._vectorize(question)
             
             for candidate in candidates:
-                similarity = self._calculate_similarity(question, candidate['question'])
+                candidate_normalized = candidate.get('normalized_question')
+                if candidate_normalized:
+                    candidate_vector = _vectorize_normalized(candidate_normalized)
+                else:
+                    candidate_vector = self._vectorize(candidate['question'])
+                similarity = self._similarity_from_vectors(question_vector, candidate_vector)
                 if similarity > best_similarity and similarity >= min_similarity:
                     best_similarity = similarity
                     best_match = (candidate['id'], candidate, similarity)
@@ -215,6 +368,89 @@ class LearningMemory:
             logging.error(f"Error finding similar question: {e}")
             return None
     
+    def _sync_lsh(self, cursor) -> None:
+        """Pone al día el índice LSH con la tabla sin cargar cada búsqueda.
+        
+        Las filas propias entran al índice desde learn(); cada _LSH_SYNC_INTERVAL
+        segundos se traen las que hayan insertado otros procesos. Cada
+        _LSH_REBUILD_INTERVAL segundos el índice se reconstruye en segundo plano,
+        lo que descarta las filas borradas; solo la primera carga es en línea.
+        """
+        now = time.monotonic()
+        with self._lsh_lock:
+            loaded = self._lsh_rebuild_at > 0
+            # Una sola reconstrucción a la vez: se reserva antes de consultar la tabla
+            rebuild = not self._lsh_rebuilding and now >= self._lsh_rebuild_at
+            catch_up = loaded and not rebuild and now >= self._lsh_synced_at
+            if rebuild:
+                self._lsh_rebuilding = True
+            elif catch_up:
+                self._lsh_synced_at = now + _LSH_SYNC_INTERVAL
+            since = self._lsh_max_id
+        
+        if rebuild and loaded:
+            threading.Thread(target=self._rebuild_lsh_background, name="lsh-rebuild", daemon=True).start()
+        elif rebuild:
+            # Primera carga: sin índice no hay candidatos
+            self._rebuild_lsh(cursor)
+        elif catch_up:
+            self._catch_up_lsh(cursor, since)
+    
+    @staticmethod
+    def _fetch_lsh_rows(cursor, since: int) -> List[Dict]:
+        """Trae id y pregunta normalizada de las filas con id mayor a `since`."""
+        cursor.execute(
+            "SELECT id, normalized_question FROM chatbot_learned_responses "
+            "WHERE id > %s AND normalized_question IS NOT NULL ORDER BY id",
+            (since,)
+        )
+        return cursor.fetchall()
+    
+    def _catch_up_lsh(self, cursor, since: int) -> None:
+        """Agrega al índice las filas nuevas (la consulta y las firmas van sin el lock)."""
+        lsh = self._lsh
+        signed = [(row['id'], row['normalized_question'], lsh.signature(row['normalized_question']))
+                  for row in self._fetch_lsh_rows(cursor, since)]
+        with self._lsh_lock:
+            for key, normalized, signature in signed:
+                # Otra sincronización concurrente pudo haberla agregado ya
+                if key > self._lsh_max_id:
+                    self._lsh.insert(key, normalized, signature)
+            if signed:
+                self._lsh_max_id = max(self._lsh_max_id, signed[-1][0])
+    
+    def _rebuild_lsh(self, cursor) -> None:
+        """Reconstruye el índice desde la tabla y lo reemplaza (libera la reserva al terminar)."""
+        try:
+            rows = self._fetch_lsh_rows(cursor, 0)
+            index = _MinHashLSH()
+            for row in rows:
+                index.insert(row['id'], row['normalized_question'])
+            with self._lsh_lock:
+                self._lsh = index
+                self._lsh_max_id = max((row['id'] for row in rows), default=0)
+                # Lo insertado mientras se reconstruía entra en la próxima sincronización
+                now = time.monotonic()
+                self._lsh_synced_at = now + _LSH_SYNC_INTERVAL
+                self._lsh_rebuild_at = now + _LSH_REBUILD_INTERVAL
+        finally:
+            with self._lsh_lock:
+                self._lsh_rebuilding = False
+    
+    def _rebuild_lsh_background(self) -> None:
+        """Reconstruye el índice con una conexión propia, fuera del request."""
+        try:
+            conn = self._get_connection()
+            try:
+                with conn.cursor() as cursor:
+                    self._rebuild_lsh(cursor)
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._lsh_lock:
+                self._lsh_rebuilding = False
+            logging.error(f"Error rebuilding LSH index: {e}")
+    
     def learn(self, question: str, response: str, category: str = None,
               is_conceptual: bool = False, quality_score: float = 0.8) -> Optional[int]:
         """
@@ -264,6 +500,10 @@ class LearningMemory:
                     conn.commit()
                     entry_id = cursor.lastrowid
                     conn.close()
+                    # Disponible para find_similar sin esperar la sincronización periódica
+                    signature = self._lsh.signature(normalized)
+                    with self._lsh_lock:
+                        self._lsh.insert(entry_id, normalized, signature)
                     logging.info(f"Learned new entry: {question_key} (id={entry_id})")
                     return entry_id
                     
@@ -327,17 +567,13 @@ class LearningMemory:
         try:
             conn = self._get_connection()
             with conn.cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) as total FROM chatbot_learned_responses")
-                total = cursor.fetchone()['total']
-                
-                cursor.execute("SELECT COUNT(*) as count FROM chatbot_learned_responses WHERE is_conceptual = TRUE")
-                conceptual = cursor.fetchone()['count']
-                
-                cursor.execute("SELECT category, COUNT(*) as count FROM chatbot_learned_responses GROUP BY category")
-                categories = {r['category'] or 'unknown': r['count'] for r in cursor.fetchall()}
-                
-                cursor.execute("SELECT SUM(use_count) as total_uses FROM chatbot_learned_responses")
-                total_uses = cursor.fetchone()['total_uses'] or 0
+                # Una sola agregación por categoría; los totales se derivan de ella
+                cursor.execute("""
+                    SELECT category, COUNT(*) as count, SUM(is_conceptual) as conceptual,
+                           SUM(use_count) as total_uses
+                    FROM chatbot_learned_responses GROUP BY category
+                """)
+                category_rows = cursor.fetchall()
                 
                 cursor.execute("""
                     SELECT question, use_count FROM chatbot_learned_responses 
@@ -347,6 +583,11 @@ class LearningMemory:
                 
             conn.close()
             
+            categories = {r['category'] or 'unknown': r['count'] for r in category_rows}
+            total = sum(r['count'] for r in category_rows)
+            conceptual = int(sum(r['conceptual'] or 0 for r in category_rows))
+            total_uses = int(sum(r['total_uses'] or 0 for r in category_rows))
+            
             return {
                 'total_entries': total,
                 'conceptual_questions': conceptual,
@@ -1,6 +1,7 @@
 """LLM client modules for Groq and OpenAI."""
+import json
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 
 import requests
 
@@ -114,3 +115,42 @@ class OpenAIClient:
                 
             return f"I encountered an error: {error_message}. Please try again or rephrase your request."
 
+    def stream_response(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Stream a response from OpenAI API token by token.
+        
+        Args:
+            messages: A list of message dictionaries.
+            
+        Yields:
+            Content fragments as they arrive.
+            
+        Raises:
+            RequestException: If the request to OpenAI fails.
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        payload = {
+            "messages": messages,
+            "model": "gpt-4o-mini",
+            "temperature": 0.7,
+            "max_tokens": 4096,
+            "stream": True,
+        }
+        
+        with requests.post(self.base_url, headers=headers, json=payload, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for raw_line in response.iter_lines():
+                if not raw_line:
+                    continue
+                line = raw_line.decode("utf-8")
+                if not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)['choices'][0].get('delta', {})
+                content = delta.get('content')
+                if content:
+                    yield content
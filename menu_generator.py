@@ -408,19 +408,22 @@ class MenuGenerator:
         # Actualizar hijos de nodos económicos y sociales (eliminando duplicados)
         if economico_node and economic_categories:
             # Agregar categorías dinámicas después de las opciones existentes, eliminando duplicados
-            existing_children = economico_node.children.copy() if economico_node.children else []
+            existing_children = list(economico_node.children)
             # Eliminar duplicados manteniendo el orden: primero los existentes, luego los nuevos
             seen = set(existing_children)
             new_categories = [cat for cat in economic_categories if cat not in seen]
             economico_node.children = existing_children + new_categories
         
         if socio_node and social_categories:
-            existing_children = socio_node.children.copy() if socio_node.children else []
+            existing_children = list(socio_node.children)
             # Eliminar duplicados manteniendo el orden
             seen = set(existing_children)
             new_categories = [cat for cat in social_categories if cat not in seen]
             socio_node.children = existing_children + new_categories
         
+        # Los nodos se modificaron en el lugar: descartar índices y menús cacheados
+        menu_tree.invalidate_caches()
+        
         # Guardar menú actualizado
         menu_tree.save_menu()
         
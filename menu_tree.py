@@ -1,18 +1,36 @@
 """Sistema de menú con árbol de decisión para el chatbot."""
 import json
 import logging
+import os
+import pickle
 import re
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 
 from config import Configuration
 
+# Parser JSON acelerado si está disponible (orjson.JSONDecodeError hereda de json.JSONDecodeError)
+try:
+    import orjson as _json_parser
+except ImportError:
+    _json_parser = json
+
+# Caché serializado del menú: se descarta si cambia el formato (subir la versión al
+# modificar MenuNode o la carga) o el código de este módulo
+_MENU_CACHE_VERSION = 1
+_MODULE_MTIME_NS = os.stat(__file__).st_mtime_ns
+# Directorio del caché; por defecto, junto al archivo JSON de configuración
+_CACHE_DIR = os.getenv("MENU_CACHE_DIR")
+
 
 class MenuNode:
     """Representa un nodo en el árbol de menú."""
     
+    __slots__ = ('id', 'title', 'description', 'action', 'children', 'keywords',
+                 'db_query', 'tool', 'tool_args', 'info_text')
+    
     def __init__(self, node_id: str, title: str, description: str = "", 
-                 action: Optional[str] = None, children: Optional[List[str]] = None,
-                 keywords: Optional[List[str]] = None, db_query: Optional[str] = None,
+                 action: Optional[str] = None, children: Optional[Sequence[str]] = None,
+                 keywords: Optional[Sequence[str]] = None, db_query: Optional[str] = None,
                  tool: Optional[str] = None, tool_args: Optional[Dict[str, Any]] = None,
                  info_text: Optional[str] = None):
         """Inicializar un nodo del menú.
@@ -22,8 +40,8 @@ class MenuNode:
             title: Título del nodo
             description: Descripción del nodo
             action: Acción a realizar (query, menu, info, tool)
-            children: Lista de IDs de nodos hijos
-            keywords: Palabras clave asociadas al nodo
+            children: Lista de IDs de nodos hijos (tupla vacía compartida si no tiene)
+            keywords: Palabras clave asociadas al nodo (tupla vacía compartida si no tiene)
             db_query: Consulta SQL o término de búsqueda para la base de datos
             tool: Nombre de la herramienta MCP a ejecutar (si action="tool")
             tool_args: Argumentos para la herramienta MCP
@@ -33,8 +51,9 @@ class MenuNode:
         self.title = title
         self.description = description
         self.action = action or "menu"
-        self.children = children or []
-        self.keywords = keywords or []
+        # Las hojas (la mayoría de los nodos) comparten la tupla vacía en vez de crear listas
+        self.children = children or ()
+        self.keywords = keywords or ()
         self.db_query = db_query
         self.tool = tool
         self.tool_args = tool_args or {}
@@ -75,6 +94,10 @@ class MenuNode:
         )
 
 
+# Caracteres no alfanuméricos (emojis, puntuación) a ignorar al comparar textos
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+
+
 class MenuTree:
     """Gestiona el árbol de decisión del menú."""
     
@@ -89,33 +112,88 @@ class MenuTree:
         self.root_node_id: Optional[str] = None
         self.load_menu()
     
+    @property
+    def nodes(self) -> Dict[str, MenuNode]:
+        """Nodos del árbol indexados por ID."""
+        return self._nodes
+    
+    @nodes.setter
+    def nodes(self, value: Dict[str, MenuNode]) -> None:
+        self._nodes = value
+        self.invalidate_caches()
+    
+    def invalidate_caches(self) -> None:
+        """Descartar los índices y menús formateados derivados de los nodos.
+        
+        Debe llamarse después de modificar nodos en el lugar (agregar nodos
+        a `nodes` o cambiar sus hijos/keywords); se reconstruyen al usarse.
+        """
+        self._kw_index: Optional[Dict[str, List[MenuNode]]] = None
+        self._search_entries: Optional[List[Tuple[MenuNode, str, List[str], str, List[str], str]]] = None
+        self._fmt_cache: Dict[Optional[str], str] = {}
+    
+    def _ensure_search_index(self) -> None:
+        """Construir el índice inverso de keywords y los textos limpios de cada nodo."""
+        if self._kw_index is not None:
+            return
+        
+        kw_index: Dict[str, List[MenuNode]] = {}
+        entries = []
+        for node in self.nodes.values():
+            for keyword in node.keywords:
+                kw_index.setdefault(keyword.lower(), []).append(node)
+            
+            title_clean = _NON_WORD_RE.sub('', node.title.lower()) if node.title else ""
+            desc_clean = _NON_WORD_RE.sub('', node.description.lower()) if node.description else ""
+            entries.append((
+                node,
+                title_clean,
+                [word for word in title_clean.split() if len(word) > 3],
+                desc_clean,
+                [word for word in desc_clean.split() if len(word) > 4],
+                node.id.lower()
+            ))
+        
+        self._kw_index = kw_index
+        self._search_entries = entries
+    
     def load_menu(self) -> None:
-        """Cargar la configuración del menú desde archivo JSON."""
+        """Cargar la configuración del menú desde archivo JSON.
+        
+        Si existe un caché serializado del mismo archivo (misma fecha de
+        modificación y tamaño), se usa en lugar de volver a parsear el JSON.
+        """
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # Cargar nodos
-            for node_data in config.get("nodes", []):
-                node = MenuNode.from_dict(node_data)
-                self.nodes[node.id] = node
-            
-            # Establecer nodo raíz
-            self.root_node_id = config.get("root_node_id", "root")
+            signature = self._config_signature()
+            from_cache = self._load_menu_cache(signature)
             
-            # Validar que el nodo raíz existe
-            if self.root_node_id not in self.nodes:
-                logging.warning(f"Root node '{self.root_node_id}' not found, using first node")
-                if self.nodes:
-                    self.root_node_id = list(self.nodes.keys())[0]
+            if not from_cache:
+                with open(self.config_path, 'rb') as f:
+                    config = _json_parser.loads(f.read())
+                
+                # Cargar nodos
+                for node_data in config.get("nodes", []):
+                    node = MenuNode.from_dict(node_data)
+                    self.nodes[node.id] = node
+                
+                # Establecer nodo raíz
+                self.root_node_id = config.get("root_node_id", "root")
+                
+                # Validar que el nodo raíz existe
+                if self.root_node_id not in self.nodes:
+                    logging.warning(f"Root node '{self.root_node_id}' not found, using first node")
+                    if self.nodes:
+                        self.root_node_id = list(self.nodes.keys())[0]
+                
+                # Validar y limpiar children duplicados de TODOS los nodos
+                for node_id, node in self.nodes.items():
+                    if node and node.children:
+                        original_count = len(node.children)
+                        node.children = list(dict.fromkeys(node.children))  # Eliminar duplicados manteniendo orden
+                        if len(node.children) < original_count:
+                            logging.info(f"Removed {original_count - len(node.children)} duplicate children from node '{node_id}'")
             
-            # Validar y limpiar children duplicados de TODOS los nodos
-            for node_id, node in self.nodes.items():
-                if node and node.children:
-                    original_count = len(node.children)
-                    node.children = list(dict.fromkeys(node.children))  # Eliminar duplicados manteniendo orden
-                    if len(node.children) < original_count:
-                        logging.info(f"Removed {original_count - len(node.children)} duplicate children from node '{node_id}'")
+            self.invalidate_caches()
             
             # Validar que el nodo raíz existe después de la limpieza
             root_node = self.get_node(self.root_node_id)
@@ -125,6 +203,9 @@ class MenuTree:
             else:
                 logging.error(f"Root node '{self.root_node_id}' not found after loading!")
                 raise ValueError(f"Root node '{self.root_node_id}' not found")
+            
+            if not from_cache:
+                self._write_menu_cache(signature)
         except FileNotFoundError:
             logging.warning(f"Menu config file '{self.config_path}' not found, creating default menu")
             self._create_default_menu()
@@ -135,6 +216,48 @@ class MenuTree:
             logging.error(f"Error loading menu: {e}")
             self._create_default_menu()
     
+    @property
+    def _cache_path(self) -> str:
+        """Ruta del caché serializado del menú (junto al JSON, o en _CACHE_DIR)."""
+        base = f"{os.path.splitext(self.config_path)[0]}.cache.pkl"
+        if _CACHE_DIR:
+            return os.path.join(_CACHE_DIR, os.path.basename(base))
+        return base
+    
+    def _config_signature(self) -> Tuple[int, ...]:
+        """Firma del caché: versión de formato, mtime de este módulo y (mtime en ns, tamaño) del JSON."""
+        stat = os.stat(self.config_path)
+        return _MENU_CACHE_VERSION, _MODULE_MTIME_NS, stat.st_mtime_ns, stat.st_size
+    
+    def _load_menu_cache(self, signature: Tuple[int, ...]) -> bool:
+        """Cargar nodos desde el caché si corresponde a la configuración actual.
+        
+        Returns:
+            True si se usó el caché, False si hay que parsear el JSON
+        """
+        try:
+            with open(self._cache_path, 'rb') as f:
+                cached_signature, nodes, root_node_id = pickle.load(f)
+        except Exception:
+            return False  # Sin caché o caché ilegible: se regenera desde el JSON
+        
+        if cached_signature != signature:
+            return False
+        
+        self.nodes = nodes
+        self.root_node_id = root_node_id
+        return True
+    
+    def _write_menu_cache(self, signature: Tuple[int, ...]) -> None:
+        """Guardar los nodos cargados en el caché serializado (escritura atómica)."""
+        tmp_path = f"{self._cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((signature, self.nodes, self.root_node_id), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._cache_path)
+        except Exception as e:
+            logging.warning(f"Could not write menu cache: {e}")
+    
     def _create_default_menu(self) -> None:
         """Crear menú por defecto basado en las bases de datos disponibles."""
         config = Configuration()
@@ -241,6 +364,7 @@ class MenuTree:
             self.nodes[node.id] = node
         
         self.root_node_id = "root"
+        self.invalidate_caches()
         
         # Guardar menú por defecto
         self.save_menu()
@@ -282,12 +406,26 @@ class MenuTree:
     def format_menu(self, node_id: Optional[str] = None) -> str:
         """Formatear el menú para mostrar al usuario.
         
+        El texto de cada nodo se calcula una vez y se reutiliza hasta que
+        se invaliden los cachés del árbol.
+        
         Args:
             node_id: ID del nodo a mostrar. Si es None, muestra el raíz.
             
         Returns:
             String formateado con el menú
         """
+        cache_key = node_id if node_id is not None else self.root_node_id
+        cached = self._fmt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        result = self._render_menu(node_id)
+        self._fmt_cache[cache_key] = result
+        return result
+    
+    def _render_menu(self, node_id: Optional[str] = None) -> str:
+        """Construir el texto del menú de un nodo (sin caché)."""
         try:
             if node_id is None:
                 node_id = self.root_node_id
@@ -427,7 +565,7 @@ class MenuTree:
         best_score = 0
         
         # Limpiar texto de entrada una sola vez
-        text_clean = re.sub(r'[^\w\s]', '', text_lower)
+        text_clean = _NON_WORD_RE.sub('', text_lower)
         
         # Detectar si es una consulta de acción (el usuario quiere datos, no navegar menú)
         action_words = ['comparar', 'comparacion', 'comparación', 'dame', 'muéstrame', 'muestrame',
@@ -435,15 +573,27 @@ class MenuTree:
                        'diferencia', 'variacion', 'variación', 'crecimiento', 'evolucion', 'evolución']
         is_action_query = any(word in text_lower for word in action_words)
         
-        for node in self.nodes.values():
-            score = 0
+        self._ensure_search_index()
+        
+        # Puntuar palabras clave una sola vez por keyword distinta usando el índice inverso
+        keyword_scores: Dict[int, int] = {}
+        for keyword_lower, keyword_nodes in self._kw_index.items():
+            if keyword_lower in text_lower:
+                # Puntuación más alta para coincidencias exactas
+                if keyword_lower == text_lower:
+                    points = 10
+                elif text_lower.startswith(keyword_lower) or text_lower.endswith(keyword_lower):
+                    points = 5
+                else:
+                    points = 1
+                for node in keyword_nodes:
+                    keyword_scores[id(node)] = keyword_scores.get(id(node), 0) + points
+        
+        for node, title_clean, title_words, desc_clean, desc_words, node_id_lower in self._search_entries:
+            score = keyword_scores.get(id(node), 0)
             
             # Buscar en el título del nodo (más importante)
             if node.title:
-                title_lower = node.title.lower()
-                # Remover emojis y caracteres especiales para comparación
-                title_clean = re.sub(r'[^\w\s]', '', title_lower)
-                
                 # Coincidencia exacta en título
                 if title_clean == text_clean:
                     score += 20
@@ -451,26 +601,11 @@ class MenuTree:
                 elif title_clean in text_clean or text_clean in title_clean:
                     score += 15
                 # Palabras del título en el texto
-                elif any(word in text_clean for word in title_clean.split() if len(word) > 3):
+                elif any(word in text_clean for word in title_words):
                     score += 10
             
-            # Buscar en palabras clave
-            if node.keywords:
-                for keyword in node.keywords:
-                    keyword_lower = keyword.lower()
-                    if keyword_lower in text_lower:
-                        # Puntuación más alta para coincidencias exactas
-                        if keyword_lower == text_lower:
-                            score += 10
-                        elif text_lower.startswith(keyword_lower) or text_lower.endswith(keyword_lower):
-                            score += 5
-                        else:
-                            score += 1
-            
             # Buscar en la descripción del nodo
             if node.description:
-                desc_lower = node.description.lower()
-                desc_clean = re.sub(r'[^\w\s]', '', desc_lower)
                 # Coincidencia exacta con descripción
                 if desc_clean == text_clean:
                     score += 15
@@ -478,11 +613,10 @@ class MenuTree:
                 elif desc_clean in text_clean or text_clean in desc_clean:
                     score += 10
                 # Palabras de la descripción en el texto
-                elif any(word in text_clean for word in desc_clean.split() if len(word) > 4):
+                elif any(word in text_clean for word in desc_words):
                     score += 3
             
             # Buscar en el ID del nodo (última opción)
-            node_id_lower = node.id.lower()
             if node_id_lower in text_lower or text_lower in node_id_lower:
                 score += 3
             
@@ -4,7 +4,23 @@ Mapea consultas complejas a las herramientas correctas y extrae parámetros.
 """
 import re
 import logging
-from typing import Dict, List, Optional, Tuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from difflib import get_close_matches
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# Autómata Aho-Corasick para buscar ubicaciones en una sola pasada (opcional)
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - depende del entorno
+    ahocorasick = None
+
+# Matcher difuso en C para tipeos no listados (opcional, se usa difflib si falta)
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # pragma: no cover - depende del entorno
+    process = None
 
 # Mapeo de palabras clave a herramientas
 TOOL_MAPPINGS = {
@@ -167,6 +183,72 @@ LOCATION_CANONICAL = {
     'entre rios': 'entre ríos', 'neuquen': 'neuquén', 'rio negro': 'río negro'
 }
 
+# Marcadores de comparación, unidos en un único patrón
+_COMPARISON_RE = re.compile('|'.join([
+    r'compara\w*', r'diferencia\w*', r'vs\.?', r'entre\s+\w+\s+y\s+',
+    r'\w+\s+y\s+\w+', r'cual.*mayor', r'cual.*menor', r'mas.*que',
+    r'menos.*que'
+]))
+
+
+def _compile_tool_patterns() -> Dict[str, Tuple]:
+    """Precompila por herramienta el patrón de palabra completa de cada keyword."""
+    return {
+        tool_name: tuple((k, re.compile(rf'\b{re.escape(k)}\b')) for k in config['keywords'])
+        for tool_name, config in TOOL_MAPPINGS.items()
+    }
+
+
+_TOOL_PATTERNS = _compile_tool_patterns()
+
+
+def _build_location_automaton():
+    """Construye el autómata de ubicaciones (variante -> nombre canónico)."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for location in LOCATION_NAMES:
+        automaton.add_word(location, LOCATION_CANONICAL.get(location, location))
+    automaton.make_automaton()
+    return automaton
+
+
+_LOCATION_AUTOMATON = _build_location_automaton()
+
+# Pares (variante, canónico) para la búsqueda sin autómata, en orden fijo
+_LOCATION_PAIRS = tuple(sorted((loc, LOCATION_CANONICAL.get(loc, loc)) for loc in LOCATION_NAMES))
+
+# Tipeos no listados: se comparan las palabras sueltas de la consulta contra los nombres
+# de una sola palabra. Las palabras cortas se ignoran (un error en 4 letras es otra palabra).
+_FUZZY_MIN_LEN = 5
+_FUZZY_CUTOFF = 88
+_FUZZY_CHOICES = tuple(sorted(loc for loc in LOCATION_NAMES if ' ' not in loc and len(loc) >= _FUZZY_MIN_LEN))
+_WORD_RE = re.compile(r'\w+')
+
+# Pool compartido para consultar varias ubicaciones en paralelo (llamadas a la DB)
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("ROUTER_WORKERS", "4")))
+
+# Consulta normalizada una sola vez por ruteo: (texto en minúsculas, palabras)
+NormalizedQuery = Tuple[str, FrozenSet[str]]
+
+
+def _normalize(query: str) -> NormalizedQuery:
+    """Pasa la consulta a minúsculas y la separa en palabras."""
+    query_lower = query.lower()
+    return query_lower, frozenset(_WORD_RE.findall(query_lower))
+
+
+@lru_cache(maxsize=4096)
+def _fuzzy_location(token: str) -> Optional[str]:
+    """Nombre canónico de la ubicación más parecida a una palabra, o None."""
+    if process is not None:
+        match = process.extractOne(token, _FUZZY_CHOICES, scorer=fuzz.ratio, score_cutoff=_FUZZY_CUTOFF)
+        best = match[0] if match else None
+    else:
+        matches = get_close_matches(token, _FUZZY_CHOICES, n=1, cutoff=_FUZZY_CUTOFF / 100)
+        best = matches[0] if matches else None
+    return LOCATION_CANONICAL.get(best, best) if best else None
+
 
 class QueryRouter:
     """Router inteligente para consultas complejas."""
@@ -174,30 +256,28 @@ class QueryRouter:
     def __init__(self, tool_executor):
         self.tool_executor = tool_executor
     
-    def detect_tool(self, query: str) -> Optional[str]:
+    def detect_tool(self, query: str, normalized: Optional[NormalizedQuery] = None) -> Optional[str]:
         """
         Detecta qué herramienta usar basándose en las palabras clave.
         
         Args:
             query: Consulta del usuario
+            normalized: Resultado de _normalize(query), si ya se calculó
             
         Returns:
             Nombre de la herramienta o None si no se detecta
         """
-        query_lower = query.lower()
+        query_lower = (normalized or _normalize(query))[0]
         
         best_tool = None
         best_score = 0
         
-        for tool_name, config in TOOL_MAPPINGS.items():
+        for tool_name, word_patterns in _TOOL_PATTERNS.items():
             score = 0
-            for keyword in config['keywords']:
+            for keyword, word_pattern in word_patterns:
                 if keyword in query_lower:
                     # Más puntos si es una coincidencia exacta de palabra
-                    if re.search(rf'\b{re.escape(keyword)}\b', query_lower):
-                        score += 10
-                    else:
-                        score += 5
+                    score += 10 if word_pattern.search(query_lower) else 5
             
             if score > best_score:
                 best_score = score
@@ -205,36 +285,50 @@ class QueryRouter:
         
         return best_tool if best_score >= 5 else None
     
-    def extract_locations(self, query: str) -> List[str]:
+    def extract_locations(self, query: str, normalized: Optional[NormalizedQuery] = None) -> List[str]:
         """
         Extrae nombres de lugares de la consulta, normalizando variantes.
         
         Args:
             query: Consulta del usuario
+            normalized: Resultado de _normalize(query), si ya se calculó
             
         Returns:
             Lista de nombres de lugares encontrados (normalizados)
         """
-        query_lower = query.lower()
-        found_locations = []
+        query_lower, words = normalized or _normalize(query)
+        
+        if _LOCATION_AUTOMATON is not None:
+            # Una pasada del autómata: coincidencias en orden de aparición, ya normalizadas
+            hits = [(end, canonical) for end, canonical in _LOCATION_AUTOMATON.iter(query_lower)]
+        else:
+            # Sin autómata: buscar cada variante y ordenar por posición (mismo orden que el autómata)
+            hits = []
+            for location, canonical in _LOCATION_PAIRS:
+                idx = query_lower.find(location)
+                if idx >= 0:
+                    hits.append((idx + len(location) - 1, canonical))
         
-        # Buscar ubicaciones conocidas
-        for location in LOCATION_NAMES:
-            if location in query_lower:
-                # Normalizar a nombre canónico si existe variante
-                canonical = LOCATION_CANONICAL.get(location, location)
-                if canonical not in found_locations:
-                    found_locations.append(canonical)
+        # Palabras que no son ubicaciones conocidas: buscar tipeos no listados
+        for word in words:
+            if len(word) < _FUZZY_MIN_LEN or word in LOCATION_NAMES:
+                continue
+            canonical = _fuzzy_location(word)
+            if canonical:
+                hits.append((query_lower.find(word) + len(word) - 1, canonical))
         
-        return found_locations
+        hits.sort()
+        return list(dict.fromkeys(canonical for _, canonical in hits))
     
-    def extract_params(self, query: str, tool_name: str) -> Dict:
+    def extract_params(self, query: str, tool_name: str,
+                       normalized: Optional[NormalizedQuery] = None) -> Dict:
         """
         Extrae parámetros para la herramienta basándose en la consulta.
         
         Args:
             query: Consulta del usuario
             tool_name: Nombre de la herramienta
+            normalized: Resultado de _normalize(query), si ya se calculó
             
         Returns:
             Diccionario de parámetros
@@ -244,7 +338,7 @@ class QueryRouter:
         
         # Extraer valores de parámetros específicos
         if 'param_values' in config:
-            query_lower = query.lower()
+            query_lower = (normalized or _normalize(query))[0]
             for keyword, value in config['param_values'].items():
                 if keyword in query_lower:
                     params[config['param_name']] = value
@@ -252,23 +346,23 @@ class QueryRouter:
         
         return params
     
-    def is_comparison_query(self, query: str) -> bool:
+    def is_comparison_query(self, query: str, normalized: Optional[NormalizedQuery] = None,
+                            locations: Optional[List[str]] = None) -> bool:
         """
         Detecta si es una consulta de comparación.
-        """
-        comparison_patterns = [
-            r'compara\w*', r'diferencia\w*', r'vs\.?', r'entre\s+\w+\s+y\s+',
-            r'\w+\s+y\s+\w+', r'cual.*mayor', r'cual.*menor', r'mas.*que',
-            r'menos.*que'
-        ]
         
-        query_lower = query.lower()
-        for pattern in comparison_patterns:
-            if re.search(pattern, query_lower):
-                return True
+        Args:
+            query: Consulta del usuario
+            normalized: Resultado de _normalize(query), si ya se calculó
+            locations: Resultado de extract_locations(query), si ya se calculó
+        """
+        normalized = normalized or _normalize(query)
+        if _COMPARISON_RE.search(normalized[0]):
+            return True
         
         # También es comparación si menciona 2+ lugares
-        locations = self.extract_locations(query)
+        if locations is None:
+            locations = self.extract_locations(query, normalized)
         return len(locations) >= 2
     
     def route_and_execute(self, query: str) -> Optional[Tuple[str, str]]:
@@ -284,8 +378,10 @@ class QueryRouter:
         if not self.tool_executor or not self.tool_executor.is_available():
             return None
         
+        normalized = _normalize(query)
+        
         # Detectar herramienta
-        tool_name = self.detect_tool(query)
+        tool_name = self.detect_tool(query, normalized)
         if not tool_name:
             logging.info(f"No tool detected for query: {query[:50]}")
             return None
@@ -293,22 +389,28 @@ class QueryRouter:
         logging.info(f"Detected tool {tool_name} for query: {query[:50]}")
         
         # Extraer ubicaciones
-        locations = self.extract_locations(query)
+        locations = self.extract_locations(query, normalized)
         
         # Extraer otros parámetros
-        params = self.extract_params(query, tool_name)
+        params = self.extract_params(query, tool_name, normalized)
         
         config = TOOL_MAPPINGS.get(tool_name, {})
         param_name = config.get('param_name')
         
         # Si es una consulta de comparación con múltiples ubicaciones
-        if self.is_comparison_query(query) and locations and param_name:
-            results = []
-            for location in locations:
-                loc_params = {param_name: location, **params}
-                result = self.tool_executor.execute(tool_name, loc_params)
-                if result and "No se encontraron" not in result and "Error" not in result:
-                    results.append(result)
+        if self.is_comparison_query(query, normalized, locations) and locations and param_name:
+            def execute_location(location: str) -> str:
+                return self.tool_executor.execute(tool_name, {param_name: location, **params})
+            
+            # Una consulta por ubicación; map conserva el orden de las ubicaciones
+            if len(locations) > 1:
+                location_results = list(_POOL.map(execute_location, locations))
+            else:
+                location_results = [execute_location(locations[0])]
+            results = [
+                result for result in location_results
+                if result and "No se encontraron" not in result and "Error" not in result
+            ]
             
             if results:
                 combined = self._format_comparison(results, config.get('description', 'datos'))
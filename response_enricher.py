@@ -2,8 +2,14 @@
 Enriquecedor de respuestas usando LLM.
 Agrega contexto y explicaciones a los datos de la base de datos.
 """
+import asyncio
 import logging
-from typing import Optional, Any
+import os
+import re
+import statistics
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, AsyncIterator, List
 
 ENRICHMENT_PROMPT = """Eres un asistente del IPECD (Instituto Provincial de Estadística y Censos de Corrientes).
 
@@ -31,59 +37,224 @@ Genera una respuesta corta que contextualice estos datos de forma clara y amigab
 Si hay una tabla de datos, puedes resumir los puntos clave sin repetir toda la tabla.
 """
 
+# Prefijos de respuestas de error o sin datos que no vale la pena enriquecer
+_ERROR_PREFIXES = ("Error", "Lo siento", "⚠️", "❌", "Sin datos", "No se encontraron")
+
+# Por encima de este tamaño se comprimen las tablas antes de enviarlas al LLM
+_COMPRESS_THRESHOLD = 2000
+
+# Pool compartido y acotado para las llamadas bloqueantes al LLM
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("ENRICH_WORKERS", "8")))
+
+
+def _parse_number(cell: str) -> Optional[float]:
+    """Convierte una celda formateada ("1,234", "+2.5%", "$1100") en número."""
+    cleaned = cell.strip().replace(",", "").replace("$", "").replace("%", "").lstrip("+")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+# Columnas de tiempo: son numéricas pero sumarlas o promediarlas no tiene sentido
+_PERIOD_HEADERS = ("ano", "anio", "year", "periodo", "fecha", "date", "mes", "trimestre", "semestre")
+
+
+def _is_period_column(name: str) -> bool:
+    """Indica si una columna es de año/período/fecha según su encabezado.
+    
+    Los valores solos no alcanzan: conteos o montos entre 1900 y 2100 parecen años.
+    """
+    header = unicodedata.normalize("NFKD", name.lower()).encode("ascii", "ignore").decode()
+    return any(word in _PERIOD_HEADERS for word in re.split(r"[\W_]+", header))
+
+
+# Separador de tabla markdown: |---|, | --- |, |:---|, |---:| o :---: (pipes de borde opcionales)
+_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+
+
+def _split_row(line: str) -> List[str]:
+    """Separa una fila de tabla markdown en celdas."""
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _summarize_rows(header: List[str], rows: List[List[str]]) -> str:
+    """Calcula min/max/media de las columnas numéricas de las filas omitidas."""
+    aggregates = []
+    for idx, name in enumerate(header):
+        values = [_parse_number(row[idx]) for row in rows if idx < len(row)]
+        if not values or any(v is None for v in values) or _is_period_column(name):
+            continue
+        aggregates.append(
+            f"{name}: min={min(values):g}, max={max(values):g}, media={statistics.fmean(values):.2f}"
+        )
+    return "; ".join(aggregates)
+
+
+def _compress_table(md: str, keep: int = 5) -> str:
+    """
+    Acorta las tablas markdown largas conservando las primeras y últimas filas.
+    
+    Las filas intermedias se reemplazan por una línea con la cantidad omitida y
+    los agregados de las columnas numéricas, para reducir los tokens del prompt.
+    
+    Args:
+        md: Texto con una o más tablas markdown
+        keep: Filas a conservar al inicio y al final de cada tabla
+        
+    Returns:
+        Texto con las tablas largas comprimidas
+    """
+    lines = md.split("\n")
+    output: List[str] = []
+    i = 0
+    while i < len(lines):
+        # Una tabla es encabezado + separador (|---|) + filas
+        is_table = (
+            lines[i].lstrip().startswith("|")
+            and i + 1 < len(lines)
+            and _SEPARATOR_RE.match(lines[i + 1].strip()) is not None
+        )
+        if not is_table:
+            output.append(lines[i])
+            i += 1
+            continue
+        
+        start = i + 2
+        end = start
+        while end < len(lines) and lines[end].lstrip().startswith("|"):
+            end += 1
+        body = lines[start:end]
+        output.extend(lines[i:start])
+        
+        if len(body) <= 2 * keep:
+            output.extend(body)
+        else:
+            omitted = body[keep:-keep]
+            summary = _summarize_rows(_split_row(lines[i]), [_split_row(row) for row in omitted])
+            note = f"... ({len(omitted)} filas omitidas"
+            note += f", agregados: {summary}) ..." if summary else ") ..."
+            output.extend(body[:keep])
+            output.append(note)
+            output.extend(body[-keep:])
+        i = end
+    return "\n".join(output)
+
 
 class ResponseEnricher:
     """Enriquece respuestas de datos con contexto usando LLM."""
     
     def __init__(self, openai_client: Optional[Any] = None):
-        self.client = openai_client
+        self.client = None
+        self._get_response = None
+        # El mensaje de sistema es fijo: se crea una sola vez y se reutiliza
+        self._system_msg = {"role": "system", "content": "Eres un asistente estadístico amigable."}
+        if openai_client:
+            self.set_client(openai_client)
     
     def set_client(self, client: Any):
         """Configura el cliente OpenAI."""
         self.client = client
+        # Cachear el método una sola vez (OpenAIClient del proyecto usa get_response)
+        self._get_response = getattr(client, "get_response", None)
     
-    def enrich(self, data_response: str, user_question: str) -> str:
+    def _build_messages(self, data_response: str, user_question: str) -> List[dict]:
+        """
+        Arma los mensajes del prompt de enriquecimiento.
+        
+        Solo el mensaje de usuario se crea por llamada: enrich() corre en paralelo
+        dentro del pool compartido, así que la lista no puede mutarse en el lugar.
+        """
+        if len(data_response) > _COMPRESS_THRESHOLD:
+            data_response = _compress_table(data_response)
+        prompt = ENRICHMENT_PROMPT.format(
+            data=data_response,
+            question=user_question
+        )
+        return [self._system_msg, {"role": "user", "content": prompt}]
+    
+    def enrich(self, data_response: str, user_question: str, client: Optional[Any] = None) -> str:
         """
         Enriquece una respuesta de datos con contexto.
         
         Args:
             data_response: Respuesta de datos del sistema (tablas, valores)
             user_question: Pregunta original del usuario
+            client: Cliente OpenAI para esta llamada (por defecto, el configurado)
             
         Returns:
             Respuesta enriquecida con contexto
         """
-        if not self.client:
-            # Sin LLM, devolver datos tal cual
+        # El cliente se resuelve por llamada: la instancia es global y atiende requests concurrentes
+        get_response = self._get_response if client is None else getattr(client, "get_response", None)
+        if get_response is None:
+            # Sin LLM (o sin get_response), devolver datos tal cual
             return data_response
         
         # Si la respuesta es muy corta o es un error, no enriquecer
-        if len(data_response) < 50 or "Error" in data_response or "Lo siento" in data_response:
+        if len(data_response) < 50 or data_response.startswith(_ERROR_PREFIXES):
             return data_response
         
         try:
-            prompt = ENRICHMENT_PROMPT.format(
-                data=data_response,
-                question=user_question
-            )
-            
-            messages = [
-                {"role": "system", "content": "Eres un asistente estadístico amigable."},
-                {"role": "user", "content": prompt}
-            ]
+            messages = self._build_messages(data_response, user_question)
             
-            # Usar el cliente (OpenAIClient del proyecto usa get_response)
-            if hasattr(self.client, 'get_response'):
-                enriched = self.client.get_response(messages)
-                if enriched:
-                    logging.info(f"Response enriched for: {user_question[:30]}...")
-                    return enriched
+            enriched = get_response(messages)
+            if enriched:
+                logging.info(f"Response enriched for: {user_question[:30]}...")
+                return enriched
             
             return data_response
             
         except Exception as e:
             logging.error(f"Error enriching response: {e}")
             return data_response
+    
+    async def enrich_stream(self, data_response: str, user_question: str,
+                            client: Optional[Any] = None) -> AsyncIterator[str]:
+        """
+        Versión en streaming de enrich: emite fragmentos a medida que llegan del LLM.
+        
+        Si el cliente no soporta streaming o la respuesta no debe enriquecerse,
+        emite los datos originales en un único fragmento.
+        
+        Args:
+            data_response: Respuesta de datos del sistema (tablas, valores)
+            user_question: Pregunta original del usuario
+            client: Cliente OpenAI para esta llamada (por defecto, el configurado)
+            
+        Yields:
+            Fragmentos de la respuesta enriquecida
+        """
+        stream_response = getattr(self.client if client is None else client, "stream_response", None)
+        if stream_response is None or len(data_response) < 50 or data_response.startswith(_ERROR_PREFIXES):
+            yield data_response
+            return
+        
+        chunks = iter(stream_response(self._build_messages(data_response, user_question)))
+        sent_any = False
+        pending = None
+        try:
+            while True:
+                # Cada lectura bloqueante del stream se hace en el pool compartido
+                pending = _POOL.submit(next, chunks, None)
+                chunk = await asyncio.wrap_future(pending)
+                if chunk is None:
+                    break
+                sent_any = True
+                yield chunk
+        except Exception as e:
+            logging.error(f"Error streaming enriched response: {e}")
+            if not sent_any:
+                yield data_response
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                if pending is not None and not pending.done():
+                    # El cliente se desconectó mientras next() corría en el pool: cerrar el
+                    # generador ahí mismo cuando termine (cerrarlo ahora lanza ValueError)
+                    pending.add_done_callback(lambda _: close())
+                else:
+                    close()
 
 
 # Instancia global
@@ -110,8 +281,22 @@ def enrich_data_response(data: str, question: str, client: Optional[Any] = None)
     Returns:
         Respuesta enriquecida
     """
-    enricher = get_response_enricher()
-    if client:
-        enricher.set_client(client)
-    return enricher.enrich(data, question)
+    return get_response_enricher().enrich(data, question, client)
+
+
 
+async def enrich_data_response_async(data: str, question: str, client: Optional[Any] = None) -> str:
+    """
+    Versión asíncrona de enrich_data_response.
+    Ejecuta la llamada al LLM en el pool compartido sin bloquear el event loop.
+    
+    Args:
+        data: Datos del sistema
+        question: Pregunta del usuario
+        client: Cliente OpenAI opcional
+        
+    Returns:
+        Respuesta enriquecida
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_POOL, get_response_enricher().enrich, data, question, client)
@@ -1,11 +1,7 @@
 """Pytest configuration and shared fixtures."""
-import os
-import sys
 import pytest
-from unittest.mock import MagicMock, AsyncMock
-
-# Agregar el directorio raíz al path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from types import SimpleNamespace
+from unittest.mock import MagicMock, AsyncMock, patch
 
 
 # ==================== FIXTURES BÁSICOS ====================
@@ -71,20 +67,20 @@ def sample_menu_config():
 @pytest.fixture
 def mock_db_connection():
     """Mock de conexión a base de datos."""
-    conn = MagicMock()
-    cursor = MagicMock()
-    conn.cursor.return_value = cursor
-    cursor.fetchall.return_value = []
-    cursor.fetchone.return_value = None
+    cursor = SimpleNamespace(
+        fetchall=lambda: [],
+        fetchone=lambda: None,
+        execute=lambda *args, **kwargs: None,
+        close=lambda: None
+    )
+    conn = SimpleNamespace(cursor=lambda *args, **kwargs: cursor, close=lambda: None)
     return conn, cursor
 
 
 @pytest.fixture
 def mock_llm_client():
     """Mock del cliente LLM."""
-    client = MagicMock()
-    client.get_response = MagicMock(return_value="Respuesta de prueba del LLM")
-    return client
+    return SimpleNamespace(get_response=lambda *args, **kwargs: "Respuesta de prueba del LLM")
 
 
 @pytest.fixture
@@ -146,6 +142,59 @@ def env_vars(monkeypatch):
     monkeypatch.setenv("NAME_DBB_DWH_SOCIO", "dhw_sociodemografico")
 
 
+@pytest.fixture(scope="session", autouse=True)
+def menu_cache_dir(tmp_path_factory):
+    """El caché serializado del menú se escribe en un directorio temporal, no en el repo."""
+    with pytest.MonkeyPatch.context() as mp:
+        cache_dir = tmp_path_factory.mktemp("menu_cache")
+        mp.setattr("menu_tree._CACHE_DIR", str(cache_dir))
+        yield cache_dir
+
+
+# ==================== FIXTURES DE API ====================
+
+@pytest.fixture(scope="session")
+def api_app():
+    """App FastAPI importada una sola vez con sus dependencias mockeadas."""
+    with patch('api.Configuration') as config_cls, \
+         patch('api.ChatSession') as chat_session_cls, \
+         patch('api.DatabaseClient'), \
+         patch('api.DatabaseTools'), \
+         patch('api.ToolExecutor'), \
+         patch('api.get_learning_memory', return_value=None):
+        # Configuración mínima para que el lifespan arranque sin servicios externos
+        config = config_cls.return_value
+        config.load_config.return_value = {"mcpServers": {}}
+        config.has_database_config = False
+        config.has_openai_key = False
+        config.has_serp_api_key = False
+        chat_session_cls.return_value.cleanup_servers = AsyncMock()
+        from api import app
+        yield app
+
+
+@pytest.fixture(scope="session")
+def client(api_app):
+    """Cliente de prueba compartido; el lifespan de la app se ejecuta una sola vez."""
+    from fastapi.testclient import TestClient
+    with TestClient(api_app) as test_client:
+        yield test_client
+
+
+# ==================== FIXTURES DE MEMORIA ====================
+
+@pytest.fixture(scope="session")
+def memory():
+    """LearningMemory compartida, creada sin tocar la base de datos.
+    
+    Los tests la usan como solo lectura; quien necesite otra conexión debe
+    parchearla localmente con `patch.object`.
+    """
+    from learning_memory import LearningMemory
+    with patch.object(LearningMemory, '_ensure_database_and_table'):
+        return LearningMemory("localhost", 3306, "user", "pass")
+
+
 # ==================== FIXTURES ASYNC ====================
 
 @pytest.fixture
@@ -1,28 +1,15 @@
 """Tests para la API REST del chatbot."""
 import pytest
-import sys
-import os
-from unittest.mock import MagicMock, patch, AsyncMock
-from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Mantener el módulo en un mismo worker de xdist para compartir fixtures
+pytestmark = pytest.mark.xdist_group("api")
 
 
 class TestAPIBasic:
     """Tests básicos de la API."""
     
-    @pytest.fixture
-    def client(self):
-        """Cliente de prueba para la API."""
-        # Mockear dependencias antes de importar
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=None):
-            from api import app
-            return TestClient(app)
-    
     @pytest.mark.api
     def test_root_endpoint(self, client):
         """El endpoint raíz retorna el frontend HTML."""
@@ -46,48 +33,64 @@ class TestAPIChatEndpoint:
     @pytest.fixture
     def mock_chat_session(self):
         """Mock de ChatSession."""
-        mock = MagicMock()
-        mock.llm_client = MagicMock()
-        mock.llm_client.get_response.return_value = "Respuesta de prueba"
-        mock.openai_client = None
-        mock.servers = []
-        return mock
+        return SimpleNamespace(
+            llm_client=SimpleNamespace(get_response=lambda *args, **kwargs: "Respuesta de prueba"),
+            openai_client=None,
+            servers=[]
+        )
     
     @pytest.fixture
     def mock_tool_executor(self):
         """Mock de ToolExecutor."""
-        mock = MagicMock()
-        mock.is_available.return_value = True
-        mock.execute.return_value = "## Datos de prueba\n| Col | Val |\n|-----|-----|\n| A | 1 |"
-        return mock
+        return SimpleNamespace(
+            is_available=lambda: True,
+            execute=lambda *args, **kwargs: "## Datos de prueba\n| Col | Val |\n|-----|-----|\n| A | 1 |"
+        )
     
     @pytest.mark.api
-    def test_chat_endpoint_exists(self):
+    def test_chat_endpoint_exists(self, client):
         """El endpoint /api/chat existe."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=None):
-            from api import app
-            client = TestClient(app)
-            # POST sin body debería dar error de validación, no 404
-            response = client.post("/api/chat")
-            assert response.status_code != 404
+        # POST sin body debería dar error de validación, no 404
+        response = client.post("/api/chat")
+        assert response.status_code != 404
     
     @pytest.mark.api
-    def test_chat_requires_message(self):
+    def test_chat_requires_message(self, client):
         """El endpoint requiere un mensaje."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=None):
-            from api import app
-            client = TestClient(app)
-            response = client.post("/api/chat", json={})
-            # Debería fallar validación de Pydantic
-            assert response.status_code == 422
+        response = client.post("/api/chat", json={})
+        # Debería fallar validación de Pydantic
+        assert response.status_code == 422
+
+
+class TestAPIToolStreamEndpoint:
+    """Tests para el endpoint de herramientas en streaming."""
+    
+    @pytest.mark.api
+    def test_tool_stream_returns_sse(self, client):
+        """El endpoint /api/tool/stream responde con eventos SSE."""
+        with patch('api.tool_executor', None):
+            response = client.post("/api/tool/stream", json={"tool": "get_ipc"})
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert response.text.startswith("data: ")
+
+    @pytest.mark.api
+    def test_tool_stream_passes_client_per_request(self, client):
+        """El cliente OpenAI se pasa al stream sin reemplazar el del enriquecedor global."""
+        import json
+        from response_enricher import get_response_enricher
+
+        data = "## IPC Corrientes\n| Mes | Variación |\n|-----|-----|\n| Enero | 2,5% |"
+        executor = SimpleNamespace(is_available=lambda: True, execute=lambda *args, **kwargs: data)
+        openai_client = SimpleNamespace(stream_response=lambda messages: iter(["Inflación ", "2,5%"]))
+        enricher = get_response_enricher()
+        configured = enricher.client
+        with patch('api.tool_executor', executor), \
+             patch('api.chat_session', SimpleNamespace(openai_client=openai_client)):
+            response = client.post("/api/tool/stream", json={"tool": "get_ipc", "question": "ipc"})
+        events = [json.loads(line[len("data: "):]) for line in response.text.split("\n\n") if line]
+        assert events == [{"t": "Inflación "}, {"t": "2,5%"}]
+        assert enricher.client is configured
 
 
 class TestAPIMemoryEndpoints:
@@ -114,44 +117,23 @@ class TestAPIMemoryEndpoints:
         return mock
     
     @pytest.mark.api
-    def test_memory_stats_endpoint(self, mock_learning_memory):
+    def test_memory_stats_endpoint(self, client, mock_learning_memory):
         """El endpoint /api/memory/stats funciona."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=mock_learning_memory), \
-             patch('api.learning_memory', mock_learning_memory):
-            from api import app
-            client = TestClient(app)
+        with patch('api.learning_memory', mock_learning_memory):
             response = client.get("/api/memory/stats")
             assert response.status_code == 200
     
     @pytest.mark.api
-    def test_memory_suggestions_endpoint(self, mock_learning_memory):
+    def test_memory_suggestions_endpoint(self, client, mock_learning_memory):
         """El endpoint /api/memory/suggestions funciona."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=mock_learning_memory), \
-             patch('api.learning_memory', mock_learning_memory):
-            from api import app
-            client = TestClient(app)
+        with patch('api.learning_memory', mock_learning_memory):
             response = client.get("/api/memory/suggestions?q=ipc")
             assert response.status_code == 200
     
     @pytest.mark.api
-    def test_memory_recent_endpoint(self, mock_learning_memory):
+    def test_memory_recent_endpoint(self, client, mock_learning_memory):
         """El endpoint /api/memory/recent funciona."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=mock_learning_memory), \
-             patch('api.learning_memory', mock_learning_memory):
-            from api import app
-            client = TestClient(app)
+        with patch('api.learning_memory', mock_learning_memory):
             response = client.get("/api/memory/recent")
             assert response.status_code == 200
 
@@ -230,34 +212,20 @@ class TestAPIErrorHandling:
     """Tests para manejo de errores de la API."""
     
     @pytest.mark.api
-    def test_invalid_json_body(self):
+    def test_invalid_json_body(self, client):
         """Maneja JSON inválido."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=None):
-            from api import app
-            client = TestClient(app)
-            response = client.post(
-                "/api/chat",
-                content="not valid json",
-                headers={"Content-Type": "application/json"}
-            )
-            assert response.status_code == 422
+        response = client.post(
+            "/api/chat",
+            content="not valid json",
+            headers={"Content-Type": "application/json"}
+        )
+        assert response.status_code == 422
     
     @pytest.mark.api
-    def test_missing_required_field(self):
+    def test_missing_required_field(self, client):
         """Maneja campo requerido faltante."""
-        with patch('api.ChatSession'), \
-             patch('api.DatabaseClient'), \
-             patch('api.DatabaseTools'), \
-             patch('api.ToolExecutor'), \
-             patch('api.get_learning_memory', return_value=None):
-            from api import app
-            client = TestClient(app)
-            response = client.post("/api/chat", json={"other_field": "value"})
-            assert response.status_code == 422
+        response = client.post("/api/chat", json={"other_field": "value"})
+        assert response.status_code == 422
 
 
 class TestAPIMenuNavigation:
@@ -289,14 +257,15 @@ class TestAPIIntegrationScenarios:
     def test_full_chat_flow_mock(self):
         """Flujo completo de chat con mocks."""
         # Este test simula un flujo completo pero con todos los componentes mockeados
-        mock_session = MagicMock()
-        mock_session.llm_client = MagicMock()
-        mock_session.llm_client.get_response.return_value = "Respuesta del LLM"
-        mock_session.servers = []
+        mock_session = SimpleNamespace(
+            llm_client=SimpleNamespace(get_response=lambda *args, **kwargs: "Respuesta del LLM"),
+            servers=[]
+        )
         
-        mock_tool_executor = MagicMock()
-        mock_tool_executor.is_available.return_value = True
-        mock_tool_executor.execute.return_value = "## Datos\n| A | B |\n|---|---|\n| 1 | 2 |"
+        mock_tool_executor = SimpleNamespace(
+            is_available=lambda: True,
+            execute=lambda *args, **kwargs: "## Datos\n| A | B |\n|---|---|\n| 1 | 2 |"
+        )
         
         # Verificar que los mocks funcionan
         assert mock_session.llm_client.get_response() == "Respuesta del LLM"
@@ -1,27 +1,123 @@
 """Tests para las herramientas de base de datos."""
-import pytest
-import sys
-import os
-from unittest.mock import MagicMock, patch
+import re
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
 
 from mcp_tools_server import DatabaseTools
 
+# Mantener el módulo en un mismo worker de xdist para compartir fixtures
+pytestmark = pytest.mark.xdist_group("db_tools")
+
+
+# Datos de prueba compartidos por los fixtures
+_IPC_ROWS = [
+    {'region': 'NEA', 'fecha': '2025-10-01', 'variacion_mensual': 0.025, 'variacion_interanual': 0.30},
+    {'region': 'GBA', 'fecha': '2025-10-01', 'variacion_mensual': 0.027, 'variacion_interanual': 0.32}
+]
+_DOLAR_ROWS = [
+    {'fecha': '2025-10-01', 'compra': 1100.0, 'venta': 1150.0}
+]
+_EMPLEO_ROWS = [
+    {
+        'Aglomerado': 'Corrientes',
+        'Año': 2025,
+        'Trimestre': 2,
+        'Tasa de Actividad': 0.41,
+        'Tasa de Empleo': 0.38,
+        'Tasa de desocupación': 0.067
+    }
+]
+_CENSO_ROWS = [
+    {'municipio': 'Corrientes', 'pob_2010': 358223, 'pob_2022': 409000, 'var_relativa': 14.2},
+    {'municipio': 'Goya', 'pob_2010': 88427, 'pob_2022': 102000, 'var_relativa': 15.4}
+]
+_CENSO_DEPTOS_ROWS = [
+    {'departamento': 'Capital', 'pob_2010': 358223, 'pob_2022': 409000},
+    {'departamento': 'Goya', 'pob_2010': 88427, 'pob_2022': 102000}
+]
+_SEMAFORO_ROW = {
+    'fecha': '2025-10-01',
+    'combustible_vendido': 5.2,
+    'patentamiento_0km_auto': -2.1,
+    'empleo_sipa': 3.5
+}
+
+# Patrones precompilados para las aserciones sobre el texto de salida
+_IPC_HDR_RE = re.compile(r"IPC|Precios|##")
+_DEPTOS_HDR_RE = re.compile(r"Departamento|##")
+_NO_DATA_RE = re.compile(r"no|encontr", re.IGNORECASE)
+_ERR_RE = re.compile(r"error", re.IGNORECASE)
+
+_DB_ENV = [
+    ('HOST_DBB', 'localhost'),
+    ('DB_PORT', '3306'),
+    ('USER_DBB', 'test'),
+    ('PASSWORD_DBB', 'test'),
+    ('NAME_DBB_DATALAKE_ECONOMICO', 'datalake-economico'),
+    ('NAME_DBB_DWH_ECONOMICO', 'dhw_economico'),
+    ('NAME_DBB_DWH_SOCIO', 'dhw_sociodemografico'),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _db_env():
+    """Configura una sola vez las variables de entorno de la base de datos."""
+    mp = pytest.MonkeyPatch()
+    for key, value in _DB_ENV:
+        mp.setenv(key, value)
+    yield
+    mp.undo()
+
+
+class _StubCursor:
+    """Cursor mínimo con resultados fijos (más liviano que MagicMock)."""
+    __slots__ = ("_all", "_one", "last_sql")
+    
+    def __init__(self, all_rows=(), one_row=None):
+        self._all, self._one = all_rows, one_row
+        self.last_sql = None
+    
+    def execute(self, sql, *args, **kwargs):
+        self.last_sql = sql
+    
+    def fetchall(self):
+        return self._all
+    
+    def fetchone(self):
+        return self._one
+    
+    def close(self):
+        pass
+
+
+class _StubConn:
+    """Conexión mínima que siempre devuelve el mismo cursor."""
+    __slots__ = ("_cur",)
+    
+    def __init__(self, cur):
+        self._cur = cur
+    
+    def cursor(self, *args, **kwargs):
+        return self._cur
+    
+    def close(self):
+        pass
+
+
+_CONN_ERR = ConnectionError("Connection failed")
+
+
+def _failing_conn(*args, **kwargs):
+    """Simula una conexión a la base de datos que falla."""
+    raise _CONN_ERR
+
 
 class TestDatabaseToolsInit:
     """Tests para inicialización de DatabaseTools."""
     
-    @pytest.fixture
-    def tools_with_env(self, monkeypatch):
-        """Crea DatabaseTools con variables de entorno mockeadas."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        monkeypatch.setenv('NAME_DBB_DATALAKE_ECONOMICO', 'datalake-economico')
-        monkeypatch.setenv('NAME_DBB_DWH_ECONOMICO', 'dhw_economico')
-        monkeypatch.setenv('NAME_DBB_DWH_SOCIO', 'dhw_sociodemografico')
+    @pytest.fixture(scope="module")
+    def tools_with_env(self):
+        """Crea DatabaseTools con las variables de entorno de prueba."""
         return DatabaseTools()
     
     @pytest.mark.unit
@@ -42,13 +138,9 @@ class TestDatabaseToolsInit:
 class TestDatabaseToolsFormatting:
     """Tests para formateo de datos."""
     
-    @pytest.fixture
-    def tools(self, monkeypatch):
+    @pytest.fixture(scope="module")
+    def tools(self):
         """Crea DatabaseTools con configuración de prueba."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
         return DatabaseTools()
     
     @pytest.mark.unit
@@ -73,306 +165,105 @@ class TestDatabaseToolsFormatting:
         assert "0" in result
 
 
-class TestDatabaseToolsGetIPC:
-    """Tests para get_ipc."""
-    
-    @pytest.fixture
-    def tools_with_mock_db(self, monkeypatch):
-        """Crea DatabaseTools con mock de base de datos."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        tools = DatabaseTools()
-        
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        
-        # Datos de prueba para IPC
-        mock_cursor.fetchall.return_value = [
-            {'region': 'NEA', 'fecha': '2025-10-01', 'variacion_mensual': 0.025, 'variacion_interanual': 0.30},
-            {'region': 'GBA', 'fecha': '2025-10-01', 'variacion_mensual': 0.027, 'variacion_interanual': 0.32}
-        ]
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
-        return tools
-    
-    @pytest.mark.unit
-    def test_get_ipc_returns_string(self, tools_with_mock_db):
-        """get_ipc retorna string formateado."""
-        result = tools_with_mock_db.get_ipc()
-        assert isinstance(result, str)
-    
-    @pytest.mark.unit
-    def test_get_ipc_contains_header(self, tools_with_mock_db):
-        """get_ipc contiene header."""
-        result = tools_with_mock_db.get_ipc()
-        assert "IPC" in result or "Precios" in result or "##" in result
-
-
-class TestDatabaseToolsGetDolar:
-    """Tests para get_dolar."""
-    
-    @pytest.fixture
-    def tools_with_mock_db(self, monkeypatch):
-        """Crea DatabaseTools con mock de base de datos."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        tools = DatabaseTools()
-        
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        
-        mock_cursor.fetchall.return_value = [
-            {'fecha': '2025-10-01', 'compra': 1100.0, 'venta': 1150.0}
-        ]
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
-        return tools
-    
-    @pytest.mark.unit
-    def test_get_dolar_blue(self, tools_with_mock_db):
-        """get_dolar con tipo blue."""
-        result = tools_with_mock_db.get_dolar(tipo="blue")
-        assert isinstance(result, str)
-    
-    @pytest.mark.unit
-    def test_get_dolar_oficial(self, tools_with_mock_db):
-        """get_dolar con tipo oficial."""
-        result = tools_with_mock_db.get_dolar(tipo="oficial")
-        assert isinstance(result, str)
-    
-    @pytest.mark.unit
-    def test_get_dolar_mep(self, tools_with_mock_db):
-        """get_dolar con tipo mep."""
-        result = tools_with_mock_db.get_dolar(tipo="mep")
-        assert isinstance(result, str)
+@pytest.fixture(scope="module")
+def _shared_tools():
+    """DatabaseTools único para los getters, con un cursor stub reutilizable."""
+    tools = DatabaseTools()
+    conn = _StubConn(_StubCursor())
+    tools._get_connection = lambda *args, **kwargs: conn
+    return tools
 
 
-class TestDatabaseToolsGetEmpleo:
-    """Tests para get_empleo."""
-    
-    @pytest.fixture
-    def tools_with_mock_db(self, monkeypatch):
-        """Crea DatabaseTools con mock de base de datos."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        tools = DatabaseTools()
-        
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        
-        mock_cursor.fetchall.return_value = [
-            {
-                'Aglomerado': 'Corrientes',
-                'Año': 2025,
-                'Trimestre': 2,
-                'Tasa de Actividad': 0.41,
-                'Tasa de Empleo': 0.38,
-                'Tasa de desocupación': 0.067
-            }
-        ]
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
-        return tools
-    
-    @pytest.mark.unit
-    def test_get_empleo_eph(self, tools_with_mock_db):
-        """get_empleo con tipo eph."""
-        result = tools_with_mock_db.get_empleo(tipo="eph")
-        assert isinstance(result, str)
-    
-    @pytest.mark.unit
-    def test_get_empleo_sipa(self, tools_with_mock_db):
-        """get_empleo con tipo sipa."""
-        result = tools_with_mock_db.get_empleo(tipo="sipa")
-        assert isinstance(result, str)
+@pytest.fixture
+def mock_tools(request, _shared_tools):
+    """Reasigna las filas del cursor compartido según el caso parametrizado."""
+    cursor = _shared_tools._get_connection().cursor()
+    cursor._all, cursor._one = request.param
+    return _shared_tools
 
 
-class TestDatabaseToolsGetCenso:
-    """Tests para get_censo."""
-    
-    @pytest.fixture
-    def tools_with_mock_db(self, monkeypatch):
-        """Crea DatabaseTools con mock de base de datos."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        tools = DatabaseTools()
-        
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        
-        mock_cursor.fetchall.return_value = [
-            {'municipio': 'Corrientes', 'pob_2010': 358223, 'pob_2022': 409000, 'var_relativa': 14.2},
-            {'municipio': 'Goya', 'pob_2010': 88427, 'pob_2022': 102000, 'var_relativa': 15.4}
-        ]
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
-        return tools
+class TestDatabaseToolsGetters:
+    """Tests para get_ipc, get_dolar, get_empleo, get_censo y get_semaforo."""
     
     @pytest.mark.unit
-    def test_get_censo_returns_string(self, tools_with_mock_db):
-        """get_censo retorna string formateado."""
-        result = tools_with_mock_db.get_censo()
-        assert isinstance(result, str)
+    @pytest.mark.parametrize("mock_tools,method,kwargs", [
+        ((_IPC_ROWS, None), "get_ipc", {}),
+        ((_DOLAR_ROWS, None), "get_dolar", {"tipo": "blue"}),
+        ((_DOLAR_ROWS, None), "get_dolar", {"tipo": "oficial"}),
+        ((_DOLAR_ROWS, None), "get_dolar", {"tipo": "mep"}),
+        ((_EMPLEO_ROWS, None), "get_empleo", {"tipo": "eph"}),
+        ((_EMPLEO_ROWS, None), "get_empleo", {"tipo": "sipa"}),
+        ((_CENSO_ROWS, None), "get_censo", {}),
+        ((_CENSO_ROWS, None), "get_censo", {"municipio": "Corrientes"}),
+        ((_CENSO_DEPTOS_ROWS, None), "get_censo_departamentos", {}),
+        (([], _SEMAFORO_ROW), "get_semaforo", {}),
+    ], ids=[
+        "ipc", "dolar-blue", "dolar-oficial", "dolar-mep", "empleo-eph",
+        "empleo-sipa", "censo", "censo-municipio", "censo-deptos", "semaforo",
+    ], indirect=["mock_tools"])
+    def test_returns_string(self, mock_tools, method, kwargs):
+        """Cada herramienta retorna string formateado."""
+        assert isinstance(getattr(mock_tools, method)(**kwargs), str)
     
     @pytest.mark.unit
-    def test_get_censo_with_municipio(self, tools_with_mock_db):
-        """get_censo con filtro de municipio."""
-        result = tools_with_mock_db.get_censo(municipio="Corrientes")
-        assert isinstance(result, str)
+    @pytest.mark.parametrize("mock_tools", [(_IPC_ROWS, None)], ids=["ipc"], indirect=True)
+    def test_get_ipc_contains_header(self, mock_tools):
+        """get_ipc contiene header."""
+        assert _IPC_HDR_RE.search(mock_tools.get_ipc())
     
     @pytest.mark.unit
-    def test_get_censo_contains_table(self, tools_with_mock_db):
+    @pytest.mark.parametrize("mock_tools", [(_CENSO_ROWS, None)], ids=["censo"], indirect=True)
+    def test_get_censo_contains_table(self, mock_tools):
         """get_censo contiene tabla markdown."""
-        result = tools_with_mock_db.get_censo()
-        assert "|" in result  # Separador de tabla markdown
-
-
-class TestDatabaseToolsGetCensoDepartamentos:
-    """Tests para get_censo_departamentos."""
-    
-    @pytest.fixture
-    def tools_with_mock_db(self, monkeypatch):
-        """Crea DatabaseTools con mock de base de datos."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        tools = DatabaseTools()
-        
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        
-        mock_cursor.fetchall.return_value = [
-            {'departamento': 'Capital', 'pob_2010': 358223, 'pob_2022': 409000},
-            {'departamento': 'Goya', 'pob_2010': 88427, 'pob_2022': 102000}
-        ]
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
-        return tools
+        assert "|" in mock_tools.get_censo()  # Separador de tabla markdown
     
     @pytest.mark.unit
-    def test_get_censo_departamentos_returns_string(self, tools_with_mock_db):
-        """get_censo_departamentos retorna string formateado."""
-        result = tools_with_mock_db.get_censo_departamentos()
-        assert isinstance(result, str)
-    
-    @pytest.mark.unit
-    def test_get_censo_departamentos_contains_header(self, tools_with_mock_db):
+    @pytest.mark.parametrize("mock_tools", [(_CENSO_DEPTOS_ROWS, None)], ids=["censo-deptos"], indirect=True)
+    def test_get_censo_departamentos_contains_header(self, mock_tools):
         """get_censo_departamentos contiene header."""
-        result = tools_with_mock_db.get_censo_departamentos()
-        assert "Departamento" in result or "##" in result
-
-
-class TestDatabaseToolsGetSemaforo:
-    """Tests para get_semaforo."""
-    
-    @pytest.fixture
-    def tools_with_mock_db(self, monkeypatch):
-        """Crea DatabaseTools con mock de base de datos."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
-        tools = DatabaseTools()
-        
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        
-        mock_cursor.fetchone.return_value = {
-            'fecha': '2025-10-01',
-            'combustible_vendido': 5.2,
-            'patentamiento_0km_auto': -2.1,
-            'empleo_sipa': 3.5
-        }
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
-        return tools
-    
-    @pytest.mark.unit
-    def test_get_semaforo_returns_string(self, tools_with_mock_db):
-        """get_semaforo retorna string formateado."""
-        result = tools_with_mock_db.get_semaforo()
-        assert isinstance(result, str)
+        assert _DEPTOS_HDR_RE.search(mock_tools.get_censo_departamentos())
 
 
 class TestDatabaseToolsErrorHandling:
     """Tests para manejo de errores."""
     
-    @pytest.fixture
-    def tools_with_failing_db(self, monkeypatch):
+    @pytest.fixture(scope="module")
+    def tools_with_failing_db(self):
         """Crea DatabaseTools con DB que falla."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
         tools = DatabaseTools()
         
-        tools._get_connection = MagicMock(side_effect=Exception("Connection failed"))
+        tools._get_connection = _failing_conn
         return tools
     
     @pytest.mark.unit
-    def test_get_ipc_handles_db_error(self, tools_with_failing_db):
-        """get_ipc maneja error de conexión."""
-        result = tools_with_failing_db.get_ipc()
-        assert "Error" in result or "error" in result.lower()
-    
-    @pytest.mark.unit
-    def test_get_dolar_handles_db_error(self, tools_with_failing_db):
-        """get_dolar maneja error de conexión."""
-        result = tools_with_failing_db.get_dolar()
-        assert "Error" in result or "error" in result.lower()
-    
-    @pytest.mark.unit
-    def test_get_censo_handles_db_error(self, tools_with_failing_db):
-        """get_censo maneja error de conexión."""
-        result = tools_with_failing_db.get_censo()
-        assert "Error" in result or "error" in result.lower()
+    @pytest.mark.parametrize("method", ["get_ipc", "get_dolar", "get_censo"])
+    def test_handles_db_error(self, tools_with_failing_db, method):
+        """Las herramientas manejan el error de conexión."""
+        result = getattr(tools_with_failing_db, method)()
+        assert _ERR_RE.search(result)
 
 
 class TestDatabaseToolsNoData:
     """Tests para cuando no hay datos."""
     
-    @pytest.fixture
-    def tools_with_empty_db(self, monkeypatch):
+    @pytest.fixture(scope="module")
+    def tools_with_empty_db(self):
         """Crea DatabaseTools con DB vacía."""
-        monkeypatch.setenv('HOST_DBB', 'localhost')
-        monkeypatch.setenv('DB_PORT', '3306')
-        monkeypatch.setenv('USER_DBB', 'test')
-        monkeypatch.setenv('PASSWORD_DBB', 'test')
         tools = DatabaseTools()
         
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value = mock_cursor
-        mock_cursor.fetchall.return_value = []
-        mock_cursor.fetchone.return_value = None
-        
-        tools._get_connection = MagicMock(return_value=mock_conn)
+        conn = _StubConn(_StubCursor(all_rows=[], one_row=None))
+        tools._get_connection = lambda *args, **kwargs: conn
         return tools
     
     @pytest.mark.unit
     def test_get_ipc_no_data(self, tools_with_empty_db):
         """get_ipc maneja sin datos."""
         result = tools_with_empty_db.get_ipc()
-        assert "no" in result.lower() or "encontr" in result.lower()
+        assert _NO_DATA_RE.search(result)
     
     @pytest.mark.unit
     def test_get_censo_no_data(self, tools_with_empty_db):
         """get_censo maneja sin datos."""
         result = tools_with_empty_db.get_censo()
-        assert "no" in result.lower() or "encontr" in result.lower()
+        assert _NO_DATA_RE.search(result)
 
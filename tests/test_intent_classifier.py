@@ -1,9 +1,5 @@
 """Tests para el clasificador de intenciones."""
 import pytest
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from intent_classifier import (
     classify_intent,
@@ -14,6 +10,9 @@ from intent_classifier import (
     LOCATION_NAMES
 )
 
+# Mantener el módulo en un mismo worker de xdist para reutilizar el caché del clasificador
+pytestmark = pytest.mark.xdist_group("intent")
+
 
 class TestClassifyIntent:
     """Tests para la función classify_intent."""
@@ -1,24 +1,17 @@
 """Tests para el sistema de memoria y aprendizaje."""
+import random
+import re
+import threading
+
 import pytest
-import sys
-import os
 from unittest.mock import MagicMock, patch
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from learning_memory import LearningMemory
+from learning_memory import LearningMemory, _MinHashLSH
 
 
 class TestLearningMemoryNormalization:
     """Tests para normalización de texto."""
     
-    @pytest.fixture
-    def memory(self):
-        """Crea instancia de LearningMemory con mock de DB."""
-        with patch.object(LearningMemory, '_ensure_database_and_table'):
-            mem = LearningMemory("localhost", 3306, "user", "pass")
-            return mem
-    
     @pytest.mark.unit
     def test_normalize_removes_punctuation(self, memory):
         """Remueve puntuación del texto."""
@@ -55,16 +48,60 @@ class TestLearningMemoryNormalization:
         assert result == "que es el ipc"
 
 
+def _legacy_normalize_text(text):
+    """normalize_text original: define los valores de normalized_question ya guardados."""
+    text = text.lower().strip()
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    replacements = {
+        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+        'ñ': 'n', 'ü': 'u'
+    }
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    return text[:500]
+
+
+class TestLegacyNormalization:
+    """La normalización optimizada coincide byte a byte con la original."""
+    
+    CORPUS = [
+        "¿Qué es el IPC?",
+        "¡¡¡Hola!!!   ¿cómo   estás?",
+        "  ¿ inflación de enero ?  ",
+        "tasa_de_empleo 2025",
+        "«Censo» — población… de Goya",
+        "ÁÉÍÓÚ Ñandú PINGÜINO",
+        "façade crème brûlée Ærø",
+        "km² y m³ ½ ④",
+        "emoji 📊 en la pregunta 💰",
+        "tab\tsalto\nde línea\r\nfin",
+        "comillas “tipográficas” y ‘simples’ y guión‐unicode",
+        "ＩＰＣ de ｃｏｒｒｉｅｎｔｅｓ",
+        "",
+        "   ",
+        "?!",
+        "é" * 600,
+        "palabra " * 100,
+    ]
+    
+    @pytest.mark.unit
+    def test_matches_legacy_on_corpus(self, memory):
+        for text in self.CORPUS:
+            assert memory._normalize_text(text) == _legacy_normalize_text(text), text
+    
+    @pytest.mark.unit
+    def test_matches_legacy_on_random_text(self, memory):
+        alphabet = "abcñáéíóúüÁÉÑ _-.,;:¿?¡!«»—…“”'\"()[]{}ç߲½📊\t\n  0123456789ＡＢ"
+        rng = random.Random(0)
+        for _ in range(2000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            assert memory._normalize_text(text) == _legacy_normalize_text(text), repr(text)
+
+
 class TestLearningMemorySimilarity:
     """Tests para cálculo de similitud."""
     
-    @pytest.fixture
-    def memory(self):
-        """Crea instancia de LearningMemory con mock de DB."""
-        with patch.object(LearningMemory, '_ensure_database_and_table'):
-            mem = LearningMemory("localhost", 3306, "user", "pass")
-            return mem
-    
     @pytest.mark.unit
     def test_identical_texts_have_high_similarity(self, memory):
         """Textos idénticos tienen alta similitud."""
@@ -118,17 +155,250 @@ class TestLearningMemorySimilarity:
             "dame datos del ipc"
         )
         assert similarity == 0.0
+    
+    @pytest.mark.unit
+    def test_key_terms_match_whole_words(self, memory):
+        """'desempleo' y 'empleo' son términos clave distintos."""
+        similarity = memory._calculate_similarity(
+            "tasa de desempleo",
+            "tasa de empleo"
+        )
+        assert similarity == 0.0
+    
+    @pytest.mark.unit
+    @pytest.mark.parametrize("question,stored", [
+        pytest.param("ipc agosto 2024", "ipc enero 2024", id="meses"),
+        pytest.param("censo esquina", "censo goya", id="municipios"),
+        pytest.param("desempleo agosto", "desempleo enero", id="desempleo-meses"),
+    ])
+    def test_different_words_stay_below_threshold(self, memory, question, stored):
+        """Palabras distintas no cuentan como comunes (sin colisiones de hashing)."""
+        assert memory._calculate_similarity(question, stored) < memory.similarity_threshold
+    
+    @pytest.mark.unit
+    def test_find_similar_uses_stored_normalized_question(self):
+        """find_similar compara contra la columna normalized_question de la DB."""
+        # Instancia propia: find_similar actualiza el índice LSH en memoria
+        with patch.object(LearningMemory, '_ensure_database_and_table'):
+            memory = LearningMemory("localhost", 3306, "user", "pass")
+        
+        canned = {
+            "WHERE id >": [{'id': 7, 'normalized_question': 'que es el ipc'}],
+            "WHERE id IN": [{'id': 7, 'question': 'texto original', 'normalized_question': 'que es el ipc'}],
+        }
+        mock_cursor = MagicMock()
+        mock_cursor.execute.side_effect = lambda sql, *args: setattr(mock_cursor, 'last_sql', sql)
+        mock_cursor.fetchone.return_value = None
+        mock_cursor.fetchall.side_effect = lambda: next(
+            rows for marker, rows in canned.items() if marker in mock_cursor.last_sql
+        )
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.__enter__ = MagicMock(return_value=mock_cursor)
+        mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+        
+        with patch.object(memory, '_get_connection', return_value=mock_conn):
+            match = memory.find_similar("¿Qué es el IPC?")
+        
+        assert match is not None
+        assert match[0] == 7
+        assert match[2] >= 0.9
 
 
-class TestLearningMemoryKeyGeneration:
-    """Tests para generación de claves."""
+class TestMinHashLSH:
+    """Tests para el índice LSH de candidatos."""
+    
+    @pytest.fixture(scope="class")
+    def lsh(self):
+        """Índice con algunas preguntas normalizadas."""
+        index = _MinHashLSH()
+        for key, text in enumerate(["que es el ipc", "dolar blue hoy", "poblacion de goya segun el censo"]):
+            index.insert(key, text)
+        return index
+    
+    @pytest.mark.unit
+    def test_similar_text_is_candidate(self, lsh):
+        """Un texto parecido devuelve la pregunta guardada como candidata."""
+        assert 0 in lsh.query("cual es el ipc")
+    
+    @pytest.mark.unit
+    def test_unrelated_text_has_no_candidates(self, lsh):
+        """Un texto sin relación no devuelve candidatos."""
+        assert lsh.query("xyz") == []
+    
+    @pytest.mark.unit
+    def test_remove_drops_key_from_buckets(self):
+        """Una clave quitada deja de ser candidata y no deja buckets vacíos."""
+        index = _MinHashLSH()
+        index.insert(1, "que es el ipc")
+        index.remove(1)
+        index.remove(1)
+        assert len(index) == 0
+        assert index.query("que es el ipc") == []
+        assert not any(index._buckets)
+    
+    @pytest.mark.unit
+    def test_candidates_ordered_by_estimated_jaccard(self):
+        """Los candidatos vienen de mayor a menor Jaccard estimado y respetan el límite."""
+        index = _MinHashLSH()
+        index.insert(1, "que es el ipc de corrientes hoy")
+        index.insert(2, "que es el ipc")
+        index.insert(3, "que es el ipc de corrientes")
+        assert index.query("que es el ipc")[0] == 2
+        assert index.query("que es el ipc", limit=1) == [2]
+
+
+class _TableCursor:
+    """Cursor falso sobre una tabla en memoria {id: normalized_question}."""
+    
+    def __init__(self, table, on_execute=None):
+        self.table = table
+        self.on_execute = on_execute
+        self.executed = []
+        self.lastrowid = None
+        self._rows = []
+    
+    def execute(self, sql, params=()):
+        self.executed.append((sql, list(params)))
+        if self.on_execute:
+            self.on_execute(sql)
+        if "WHERE id >" in sql:
+            self._rows = [{'id': key, 'normalized_question': text}
+                          for key, text in sorted(self.table.items())
+                          if key > params[0] and (text is not None or "IS NOT NULL" not in sql)]
+        elif "INSERT" in sql:
+            self.lastrowid = max(self.table, default=0) + 1
+            self.table[self.lastrowid] = params[2]
+            self._rows = []
+        elif "WHERE id IN" in sql:
+            self._rows = [{'id': key, 'question': self.table[key], 'normalized_question': self.table[key]}
+                          for key in params if key in self.table]
+        else:
+            self._rows = []
+    
+    def fetchone(self):
+        return None
+    
+    def fetchall(self):
+        return self._rows
+
+
+class TestLSHSync:
+    """Tests para la sincronización del índice LSH con la tabla."""
     
     @pytest.fixture
-    def memory(self):
-        """Crea instancia de LearningMemory con mock de DB."""
+    def lsh_memory(self):
+        """Instancia propia: find_similar actualiza el índice LSH en memoria."""
         with patch.object(LearningMemory, '_ensure_database_and_table'):
-            mem = LearningMemory("localhost", 3306, "user", "pass")
-            return mem
+            return LearningMemory("localhost", 3306, "user", "pass")
+    
+    @staticmethod
+    def _connection(cursor):
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__ = MagicMock(return_value=cursor)
+        conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+        return conn
+    
+    @classmethod
+    def _find(cls, memory, cursor, question):
+        with patch.object(memory, '_get_connection', return_value=cls._connection(cursor)):
+            return memory.find_similar(question)
+    
+    @staticmethod
+    def _syncs(cursor):
+        return sum("WHERE id >" in sql for sql, _ in cursor.executed)
+    
+    @pytest.mark.unit
+    def test_db_query_runs_without_lsh_lock(self, lsh_memory):
+        """La consulta a la DB no se hace con el lock del índice tomado."""
+        def check_lock(sql):
+            assert not lsh_memory._lsh_lock.locked()
+        
+        cursor = _TableCursor({1: "que es el ipc"}, on_execute=check_lock)
+        assert self._find(lsh_memory, cursor, "¿Qué es el IPC?")[0] == 1
+        # Segunda búsqueda: sincronización incremental
+        assert self._find(lsh_memory, cursor, "¿Qué es el IPC?")[0] == 1
+        assert len(lsh_memory._lsh) == 1
+    
+    @pytest.mark.unit
+    def test_deleted_rows_are_removed_from_index(self, lsh_memory):
+        """Las filas borradas salen del índice al no volver de la DB."""
+        table = {1: "que es el ipc", 2: "que es el ipc de corrientes"}
+        cursor = _TableCursor(table)
+        self._find(lsh_memory, cursor, "que es el ipc hoy")
+        assert len(lsh_memory._lsh) == 2
+        
+        del table[2]
+        assert self._find(lsh_memory, cursor, "¿Qué es el IPC?")[0] == 1
+        assert len(lsh_memory._lsh) == 1
+    
+    @pytest.mark.unit
+    def test_new_rows_from_other_processes_are_polled_periodically(self, lsh_memory):
+        """Solo se consulta la tabla por filas nuevas cada _LSH_SYNC_INTERVAL segundos."""
+        table = {1: "dolar blue hoy"}
+        cursor = _TableCursor(table)
+        self._find(lsh_memory, cursor, "¿Qué es el IPC?")
+        table[2] = "que es el ipc"
+        assert self._find(lsh_memory, cursor, "¿Qué es el IPC?") is None
+        assert self._syncs(cursor) == 1
+        
+        lsh_memory._lsh_synced_at = 0.0
+        assert self._find(lsh_memory, cursor, "¿Qué es el IPC?")[0] == 2
+        assert self._syncs(cursor) == 2
+    
+    @pytest.mark.unit
+    def test_learn_adds_row_to_index(self, lsh_memory):
+        """Lo aprendido es candidato enseguida, sin otra consulta de sincronización."""
+        cursor = _TableCursor({1: "dolar blue hoy"})
+        with patch.object(lsh_memory, '_get_connection', return_value=self._connection(cursor)):
+            entry_id = lsh_memory.learn("¿Qué es el IPC?", "Índice de precios al consumidor")
+            match = lsh_memory.find_similar("que es el ipc")
+        assert match[0] == entry_id == 2
+        assert self._syncs(cursor) == 1
+    
+    @pytest.mark.unit
+    def test_rows_without_normalized_question_are_skipped(self, lsh_memory):
+        cursor = _TableCursor({1: None, 2: "que es el ipc"})
+        self._find(lsh_memory, cursor, "¿Qué es el IPC?")
+        assert list(lsh_memory._lsh._signatures) == [2]
+    
+    @pytest.mark.unit
+    def test_periodic_rebuild_runs_once_in_background(self, lsh_memory):
+        """Vencido el intervalo, una sola búsqueda dispara la reconstrucción, fuera del request."""
+        table = {1: "que es el ipc", 2: "dolar blue hoy"}
+        cursor = _TableCursor(table)
+        self._find(lsh_memory, cursor, "¿Qué es el IPC?")
+        del table[2]
+        lsh_memory._lsh_rebuild_at = 1.0
+        
+        started = threading.Event()
+        with patch.object(lsh_memory, '_rebuild_lsh_background', side_effect=started.set) as background:
+            self._find(lsh_memory, cursor, "¿Qué es el IPC?")
+            self._find(lsh_memory, cursor, "¿Qué es el IPC?")
+            assert started.wait(5)
+        assert background.call_count == 1
+        assert self._syncs(cursor) == 1
+        
+        with patch.object(lsh_memory, '_get_connection', return_value=self._connection(cursor)):
+            lsh_memory._rebuild_lsh_background()
+        assert len(lsh_memory._lsh) == 1
+        assert lsh_memory._lsh_max_id == 1
+        assert not lsh_memory._lsh_rebuilding
+    
+    @pytest.mark.unit
+    def test_scores_all_candidates_nearest_first(self, lsh_memory):
+        """Se traen a lo sumo 50 candidatos, los más parecidos, y se puntúan todos."""
+        table = {key: f"que es el ipc de corrientes en el mes {key}" for key in range(1, 80)}
+        table[80] = "que es el ipc de corrientes"
+        cursor = _TableCursor(table)
+        match = self._find(lsh_memory, cursor, "Qué es el IPC de Corrientes?")
+        sql, params = cursor.executed[-1]
+        assert "LIMIT" not in sql
+        assert len(params) == 50
+        assert match[0] == 80
+
+
+class TestLearningMemoryKeyGeneration:
+    """Tests para generación de claves."""
     
     @pytest.mark.unit
     def test_generates_key_from_question(self, memory):
@@ -162,13 +432,6 @@ class TestLearningMemoryKeyGeneration:
 class TestLearningMemoryStopWords:
     """Tests para manejo de stop words."""
     
-    @pytest.fixture
-    def memory(self):
-        """Crea instancia de LearningMemory con mock de DB."""
-        with patch.object(LearningMemory, '_ensure_database_and_table'):
-            mem = LearningMemory("localhost", 3306, "user", "pass")
-            return mem
-    
     @pytest.mark.unit
     def test_stop_words_defined(self, memory):
         """Las stop words están definidas."""
@@ -199,13 +462,6 @@ class TestLearningMemoryStopWords:
 class TestLearningMemoryStats:
     """Tests para estadísticas de la memoria."""
     
-    @pytest.fixture
-    def memory(self):
-        """Crea memoria con mock de DB."""
-        with patch.object(LearningMemory, '_ensure_database_and_table'):
-            mem = LearningMemory("localhost", 3306, "user", "pass")
-            return mem
-    
     @pytest.mark.unit
     def test_get_stats_returns_dict(self, memory):
         """get_stats retorna un diccionario (incluso con error)."""
@@ -216,41 +472,38 @@ class TestLearningMemoryStats:
     @pytest.mark.unit
     def test_stats_structure_on_success(self, memory):
         """Las estadísticas tienen los campos requeridos cuando la DB funciona."""
-        # Mockear conexión exitosa
-        mock_conn = MagicMock()
+        # Resultados fijos según la consulta ejecutada (no depende del orden de llamadas)
+        canned = {
+            "GROUP BY category": [
+                {'category': 'ipc', 'count': 2, 'conceptual': 1, 'total_uses': 9},
+                {'category': None, 'count': 3, 'conceptual': 2, 'total_uses': 6},
+            ],
+            "ORDER BY use_count": [{'question': 'que es el ipc', 'use_count': 5}],
+        }
         mock_cursor = MagicMock()
+        mock_cursor.execute.side_effect = lambda sql, *args: setattr(mock_cursor, 'last_sql', sql)
+        mock_cursor.fetchall.side_effect = lambda: next(
+            rows for marker, rows in canned.items() if marker in mock_cursor.last_sql
+        )
+        mock_conn = MagicMock()
         mock_conn.cursor.return_value.__enter__ = MagicMock(return_value=mock_cursor)
         mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
         
-        # Configurar respuestas del cursor para todas las consultas
-        mock_cursor.fetchone.side_effect = [
-            {'total': 5},       # COUNT total
-            {'count': 3},       # COUNT conceptual
-            {'total_uses': 15}  # SUM uses
-        ]
-        mock_cursor.fetchall.side_effect = [
-            [{'category': 'ipc', 'count': 2}],  # Categories
-            [{'question': 'que es el ipc', 'use_count': 5}]  # Top questions
-        ]
-        
-        memory._get_connection = MagicMock(return_value=mock_conn)
+        with patch.object(memory, '_get_connection', return_value=mock_conn):
+            stats = memory.get_stats()
         
-        stats = memory.get_stats()
-        
-        # Puede tener error o campos válidos
-        assert isinstance(stats, dict)
+        assert stats['total_entries'] == 5
+        assert stats['conceptual_questions'] == 3
+        assert stats['data_questions'] == 2
+        assert stats['categories'] == {'ipc': 2, 'unknown': 3}
+        assert stats['total_uses'] == 15
+        assert stats['average_uses'] == 3
+        assert stats['top_questions'] == [{'question': 'que es el ipc', 'uses': 5}]
 
 
 class TestEdgeCasesLearning:
     """Tests para casos extremos del sistema de aprendizaje."""
     
-    @pytest.fixture
-    def memory(self):
-        """Crea instancia de LearningMemory con mock de DB."""
-        with patch.object(LearningMemory, '_ensure_database_and_table'):
-            mem = LearningMemory("localhost", 3306, "user", "pass")
-            return mem
-    
     @pytest.mark.unit
     def test_empty_question_handling(self, memory):
         """Maneja preguntas vacías."""
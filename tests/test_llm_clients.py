@@ -0,0 +1,66 @@
+"""Tests para los clientes LLM (sin red: requests.post parcheado)."""
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from llm_clients import OpenAIClient
+
+
+class _FakeStreamResponse:
+    """Respuesta SSE falsa de OpenAI."""
+
+    def __init__(self, lines, status_code=200):
+        self.lines = lines
+        self.status_code = status_code
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+    def iter_lines(self):
+        yield from self.lines
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+def _delta(content):
+    return ('data: {"choices": [{"delta": {"content": "%s"}}]}' % content).encode()
+
+
+class TestOpenAIStreamResponse:
+    """Streaming de OpenAIClient."""
+
+    def test_yields_content_until_done(self):
+        response = _FakeStreamResponse([
+            b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            _delta("La inflación "),
+            b"",
+            b": keep-alive",
+            _delta("fue de 2,5%."),
+            b"data: [DONE]",
+            _delta("ignorado"),
+        ])
+        with patch("llm_clients.requests.post", return_value=response) as post:
+            chunks = list(OpenAIClient("key").stream_response([{"role": "user", "content": "ipc"}]))
+        assert chunks == ["La inflación ", "fue de 2,5%."]
+        assert post.call_args.kwargs["json"]["stream"] is True
+        assert response.closed
+
+    def test_early_close_releases_response(self):
+        response = _FakeStreamResponse([_delta("uno"), _delta("dos")])
+        with patch("llm_clients.requests.post", return_value=response):
+            stream = OpenAIClient("key").stream_response([])
+            assert next(stream) == "uno"
+            stream.close()
+        assert response.closed
+
+    def test_http_error_raises(self):
+        with patch("llm_clients.requests.post", return_value=_FakeStreamResponse([], status_code=500)):
+            with pytest.raises(requests.exceptions.HTTPError):
+                list(OpenAIClient("key").stream_response([]))
@@ -1,12 +1,8 @@
 """Tests para el árbol de menú y navegación."""
 import pytest
-import sys
-import os
 import json
 from unittest.mock import MagicMock, patch, mock_open
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from menu_tree import MenuTree, MenuNode
 
 
@@ -31,8 +27,8 @@ class TestMenuNode:
     def test_menu_node_default_values(self):
         """MenuNode tiene valores por defecto."""
         node = MenuNode(node_id="test", title="Test")
-        assert node.children == [] or node.children is None
-        assert node.keywords == [] or node.keywords is None
+        assert node.children == ()
+        assert node.keywords == ()
         assert node.db_query is None
         assert node.tool is None
     
@@ -120,6 +116,55 @@ class TestMenuTreeLoading:
             assert len(tree.nodes) > 0
 
 
+class TestMenuTreeCache:
+    """Tests para el caché serializado del menú."""
+    
+    @pytest.fixture
+    def config_file(self, tmp_path, sample_menu_config, monkeypatch):
+        """Archivo de configuración de menú temporal, con su caché en el mismo directorio."""
+        monkeypatch.setattr("menu_tree._CACHE_DIR", str(tmp_path))
+        path = tmp_path / "menu.json"
+        path.write_text(json.dumps(sample_menu_config), encoding="utf-8")
+        return path
+    
+    @pytest.mark.unit
+    def test_second_load_uses_cache(self, config_file):
+        """Una segunda carga del mismo archivo no vuelve a parsear el JSON."""
+        MenuTree(config_path=str(config_file))
+        assert (config_file.parent / "menu.cache.pkl").exists()
+        
+        with patch("menu_tree._json_parser.loads", side_effect=AssertionError("JSON parseado")):
+            tree = MenuTree(config_path=str(config_file))
+        
+        assert tree.get_node("ipc_ultimo") is not None
+        assert tree.find_node_by_keyword("municipio").id == "censo_municipios"
+    
+    @pytest.mark.unit
+    def test_cache_invalidated_when_config_changes(self, config_file, sample_menu_config):
+        """Si cambia el archivo de configuración se vuelve a parsear."""
+        MenuTree(config_path=str(config_file))
+        
+        sample_menu_config["nodes"][1]["title"] = "Precios actualizados"
+        config_file.write_text(json.dumps(sample_menu_config), encoding="utf-8")
+        
+        tree = MenuTree(config_path=str(config_file))
+        assert tree.get_node("cat_precios").title == "Precios actualizados"
+    
+    @pytest.mark.unit
+    @pytest.mark.parametrize("attr", ["_MENU_CACHE_VERSION", "_MODULE_MTIME_NS"])
+    def test_cache_invalidated_when_format_or_code_changes(self, config_file, monkeypatch, attr):
+        """Un caché escrito con otra versión de formato o de código no se usa."""
+        import menu_tree
+        MenuTree(config_path=str(config_file))
+        monkeypatch.setattr(menu_tree, attr, getattr(menu_tree, attr) + 1)
+        
+        with patch("menu_tree._json_parser.loads", wraps=menu_tree._json_parser.loads) as loads:
+            tree = MenuTree(config_path=str(config_file))
+        
+        assert loads.called
+        assert tree.get_node("ipc_ultimo") is not None
+
+
 class TestMenuTreeNavigation:
     """Tests para navegación del menú."""
     
@@ -250,6 +295,16 @@ class TestMenuTreeFormatting:
         """format_menu desde el nodo raíz."""
         formatted = tree_with_nodes.format_menu()
         assert len(formatted) > 0
+    
+    @pytest.mark.unit
+    def test_format_menu_refreshes_after_invalidation(self, tree_with_nodes):
+        """format_menu refleja los cambios en los hijos tras invalidar cachés."""
+        assert "Opción 2" in tree_with_nodes.format_menu("root")
+        
+        tree_with_nodes.nodes["root"].children = ["opt1"]
+        tree_with_nodes.invalidate_caches()
+        
+        assert "Opción 2" not in tree_with_nodes.format_menu("root")
 
 
 class TestMenuTreeKeywordSearch:
@@ -317,6 +372,24 @@ class TestMenuTreeKeywordSearch:
         """Retorna None si no encuentra keyword."""
         node = tree_with_keywords.find_node_by_keyword("xyz123")
         assert node is None
+    
+    @pytest.mark.unit
+    def test_find_node_after_adding_node(self, tree_with_keywords):
+        """El índice de keywords se reconstruye tras modificar los nodos."""
+        assert tree_with_keywords.find_node_by_keyword("dolar") is None
+        
+        tree_with_keywords.nodes["dolar"] = MenuNode(
+            node_id="dolar",
+            title="Cotización",
+            action="tool",
+            keywords=["dolar", "blue"],
+            children=[]
+        )
+        tree_with_keywords.invalidate_caches()
+        
+        node = tree_with_keywords.find_node_by_keyword("dolar")
+        assert node is not None
+        assert node.id == "dolar"
 
 
 class TestMenuTreeEdgeCases:
@@ -55,7 +55,7 @@ class TestToolMappings:
 class TestQueryRouterDetection:
     """Tests para detección de herramientas."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def router(self):
         mock_executor = MagicMock()
         mock_executor.is_available.return_value = True
@@ -63,22 +63,22 @@ class TestQueryRouterDetection:
     
     @pytest.mark.unit
     @pytest.mark.parametrize("query,expected_tool", [
-        ("poblacion de goya", "get_censo"),
-        ("habitantes de corrientes", "get_censo"),
-        ("cotizacion del dolar", "get_dolar"),
-        ("dolar blue", "get_dolar"),
-        ("ipc de octubre", "get_ipc"),
-        ("inflacion mensual", "get_ipc"),
-        ("tasa de empleo", "get_empleo"),
-        ("desempleo en corrientes", "get_empleo"),
-        ("semaforo economico", "get_semaforo"),
-        ("patentamientos de autos", "get_patentamientos"),
-        ("pasajeros aeropuerto", "get_aeropuertos"),
-        ("ventas de combustible", "get_combustible"),
-        ("canasta basica", "get_canasta_basica"),
-        ("linea de pobreza", "get_pobreza"),
-        ("encuesta calidad de vida", "get_ecv"),
-        ("datos del oede", "get_oede"),  # "observatorio de empleo" detecta "empleo" primero
+        pytest.param("poblacion de goya", "get_censo", id="censo-poblacion"),
+        pytest.param("habitantes de corrientes", "get_censo", id="censo-habitantes"),
+        pytest.param("cotizacion del dolar", "get_dolar", id="dolar-cotizacion"),
+        pytest.param("dolar blue", "get_dolar", id="dolar-blue"),
+        pytest.param("ipc de octubre", "get_ipc", id="ipc"),
+        pytest.param("inflacion mensual", "get_ipc", id="ipc-inflacion"),
+        pytest.param("tasa de empleo", "get_empleo", id="empleo-tasa"),
+        pytest.param("desempleo en corrientes", "get_empleo", id="empleo-desempleo"),
+        pytest.param("semaforo economico", "get_semaforo", id="semaforo"),
+        pytest.param("patentamientos de autos", "get_patentamientos", id="patentamientos"),
+        pytest.param("pasajeros aeropuerto", "get_aeropuertos", id="aeropuertos"),
+        pytest.param("ventas de combustible", "get_combustible", id="combustible"),
+        pytest.param("canasta basica", "get_canasta_basica", id="canasta-basica"),
+        pytest.param("linea de pobreza", "get_pobreza", id="pobreza"),
+        pytest.param("encuesta calidad de vida", "get_ecv", id="ecv"),
+        pytest.param("datos del oede", "get_oede", id="oede"),  # "observatorio de empleo" detecta "empleo" primero
     ])
     def test_detect_tool_by_keywords(self, router, query, expected_tool):
         """Debe detectar la herramienta correcta por palabras clave."""
@@ -124,22 +124,38 @@ class TestQueryRouterLocations:
         """No debe duplicar ubicaciones."""
         locations = router.extract_locations("corrientes y corrientrs")
         assert locations.count('corrientes') == 1
+    
+    @pytest.mark.unit
+    def test_extract_locations_in_query_order(self, router):
+        """Las ubicaciones se devuelven en el orden en que aparecen."""
+        assert router.extract_locations("mendoza, goya y ctes") == ['mendoza', 'goya', 'corrientes']
+    
+    @pytest.mark.unit
+    def test_extract_unlisted_typo(self, router):
+        """Tipeos no listados se resuelven por similitud."""
+        assert router.extract_locations("poblacion de corrientez") == ['corrientes']
+        assert router.extract_locations("empleo en missiones") == ['misiones']
+    
+    @pytest.mark.unit
+    def test_fuzzy_ignores_unrelated_words(self, router):
+        """Palabras comunes no se confunden con ubicaciones."""
+        assert router.extract_locations("actividad economica del mercado") == []
 
 
 class TestQueryRouterComparison:
     """Tests para detección de comparaciones."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def router(self):
         mock_executor = MagicMock()
         return QueryRouter(mock_executor)
     
     @pytest.mark.unit
     @pytest.mark.parametrize("query", [
-        "comparar goya y corrientes",
-        "goya vs corrientes",
-        "diferencia entre goya y mercedes",
-        "poblacion de goya y corrientes",
+        pytest.param("comparar goya y corrientes", id="comparar"),
+        pytest.param("goya vs corrientes", id="vs"),
+        pytest.param("diferencia entre goya y mercedes", id="diferencia"),
+        pytest.param("poblacion de goya y corrientes", id="y"),
     ])
     def test_is_comparison_query_true(self, router, query):
         """Debe detectar consultas de comparación."""
@@ -185,6 +201,17 @@ class TestQueryRouterExecution:
         # Debe haber llamado execute múltiples veces (una por ubicación)
         assert mock_exec.execute.call_count >= 2
     
+    @pytest.mark.unit
+    def test_route_and_execute_comparison_keeps_location_order(self, router_with_mock):
+        """Los resultados paralelos se combinan en el orden de las ubicaciones."""
+        router, mock_exec = router_with_mock
+        mock_exec.execute.side_effect = lambda tool, args: (
+            f"| Municipio | Pob |\n|---|---|\n| {args['municipio']} | 1 |"
+        )
+        _, response = router.route_and_execute("comparar poblacion de goya, mercedes y corrientes")
+        
+        assert response.index("goya") < response.index("mercedes") < response.index("corrientes")
+    
     @pytest.mark.unit
     def test_route_and_execute_no_tool(self, router_with_mock):
         """Debe retornar None si no detecta herramienta."""
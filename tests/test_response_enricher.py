@@ -0,0 +1,208 @@
+"""Tests para el enriquecedor de respuestas (con clientes LLM falsos)."""
+import asyncio
+import threading
+
+import pytest
+
+import response_enricher
+from response_enricher import ResponseEnricher
+
+# Datos con largo suficiente para que se enriquezcan
+DATA = "## IPC Corrientes\n| Mes | Variación |\n|-----|-----|\n| Enero | 2,5% |\n| Febrero | 2,1% |"
+
+
+class _FakeStreamClient:
+    """Cliente LLM falso: devuelve fragmentos fijos y registra si el stream se cerró."""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = list(chunks)
+        self.error = error
+        self.closed = threading.Event()
+
+    def get_response(self, messages):
+        return "".join(self.chunks)
+
+    def stream_response(self, messages):
+        try:
+            if self.error:
+                raise self.error
+            yield from self.chunks
+        finally:
+            self.closed.set()
+
+
+class _BlockingStreamClient(_FakeStreamClient):
+    """Cliente cuyo segundo fragmento queda bloqueado hasta que el test lo libera."""
+
+    def __init__(self):
+        super().__init__(["uno", "dos"])
+        self.waiting = threading.Event()
+        self.release = threading.Event()
+
+    def stream_response(self, messages):
+        try:
+            yield "uno"
+            self.waiting.set()
+            self.release.wait(5)
+            yield "dos"
+        finally:
+            self.closed.set()
+
+
+def _collect(stream):
+    async def run():
+        return [chunk async for chunk in stream]
+    return asyncio.run(run())
+
+
+class TestEnrichStream:
+    """Streaming de la respuesta enriquecida."""
+
+    def test_streams_all_chunks(self):
+        client = _FakeStreamClient(["La inflación ", "fue de 2,5%."])
+        chunks = _collect(ResponseEnricher().enrich_stream(DATA, "ipc", client))
+        assert chunks == ["La inflación ", "fue de 2,5%."]
+        assert client.closed.is_set()
+
+    def test_client_per_call_does_not_replace_configured_one(self):
+        configured = _FakeStreamClient(["configurado"])
+        enricher = ResponseEnricher(configured)
+        chunks = _collect(enricher.enrich_stream(DATA, "ipc", _FakeStreamClient(["por llamada"])))
+        assert chunks == ["por llamada"]
+        assert enricher.client is configured
+
+    def test_without_client_returns_data(self):
+        assert _collect(ResponseEnricher().enrich_stream(DATA, "ipc")) == [DATA]
+
+    def test_short_or_error_data_is_not_enriched(self):
+        client = _FakeStreamClient(["no debería usarse"])
+        assert _collect(ResponseEnricher().enrich_stream("Error: sin conexión", "ipc", client)) == ["Error: sin conexión"]
+
+    def test_error_before_first_chunk_returns_data(self):
+        client = _FakeStreamClient([], error=RuntimeError("timeout"))
+        assert _collect(ResponseEnricher().enrich_stream(DATA, "ipc", client)) == [DATA]
+
+    def test_disconnect_between_chunks_closes_stream(self):
+        """El consumidor corta después del primer fragmento."""
+        client = _FakeStreamClient(["uno", "dos", "tres"])
+
+        async def run():
+            stream = ResponseEnricher().enrich_stream(DATA, "ipc", client)
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first
+
+        assert asyncio.run(run()) == "uno"
+        assert client.closed.is_set()
+
+    def test_disconnect_while_chunk_is_pending(self):
+        """Cancelar mientras next() corre en el pool no falla y cierra el stream al terminar."""
+        client = _BlockingStreamClient()
+
+        async def run():
+            stream = ResponseEnricher().enrich_stream(DATA, "ipc", client)
+            assert await stream.__anext__() == "uno"
+            pending = asyncio.ensure_future(stream.__anext__())
+            # Esperar a que el pool esté dentro de next() antes de desconectar
+            await asyncio.get_running_loop().run_in_executor(None, client.waiting.wait, 5)
+            pending.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await pending
+            await stream.aclose()
+
+        asyncio.run(run())
+        assert not client.closed.is_set()
+        client.release.set()
+        assert client.closed.wait(5)
+
+
+class TestEnrich:
+    """Enriquecimiento sin streaming."""
+
+    def test_client_per_call(self):
+        enricher = ResponseEnricher()
+        assert enricher.enrich(DATA, "ipc", _FakeStreamClient(["enriquecida"])) == "enriquecida"
+        assert enricher.client is None
+        assert enricher.enrich(DATA, "ipc") == DATA
+
+
+def _table(header, rows, separator="---"):
+    lines = ["| " + " | ".join(header) + " |", "|" + f"{separator}|" * len(header)]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+class TestCompressTable:
+    """Compresión de tablas largas antes del prompt."""
+
+    def test_wide_table_keeps_edges_and_aggregates_measures(self):
+        rows = [(2000 + i, i % 4 + 1, f"{100 + i:,}", f"{i / 10:.1f}%") for i in range(20)]
+        md = "## Datos\n" + _table(["Año", "Trimestre", "Ocupados", "Variación"], rows) + "\nFuente: EPH"
+        compressed = response_enricher._compress_table(md, keep=3)
+        lines = compressed.split("\n")
+        assert lines[0] == "## Datos" and lines[-1] == "Fuente: EPH"
+        # encabezado + separador + 3 primeras + nota + 3 últimas
+        assert len(lines) == 1 + 2 + 3 + 1 + 3 + 1
+        assert lines[3] == "| 2000 | 1 | 100 | 0.0% |"
+        assert lines[-2] == "| 2019 | 4 | 119 | 1.9% |"
+        note = lines[6]
+        assert note.startswith("... (14 filas omitidas")
+        assert "Ocupados: min=103, max=116" in note
+        assert "Variación: min=0.3, max=1.6" in note
+        # Las columnas de tiempo no se agregan
+        assert "Año" not in note and "Trimestre" not in note
+
+    @pytest.mark.parametrize("header", ["Período censal", "fecha_corte", "AÑO"])
+    def test_period_columns_are_not_aggregated(self, header):
+        """Se excluyen por encabezado."""
+        rows = [(2000 + i, 10 * i) for i in range(12)]
+        note = response_enricher._compress_table(_table([header, "Casos"], rows), keep=2).split("\n")[4]
+        assert "Casos: min=20, max=90" in note
+        assert header not in note
+
+    def test_year_like_values_are_aggregated(self):
+        """Conteos entre 1900 y 2100 con encabezado que no es de período sí se agregan."""
+        rows = [(1950 + i, 10 * i) for i in range(12)]
+        note = response_enricher._compress_table(_table(["Viviendas", "Casos"], rows), keep=2).split("\n")[4]
+        assert "Viviendas: min=1952, max=1959" in note
+
+    @pytest.mark.parametrize("separator", [
+        pytest.param(" --- ", id="espaciado"),
+        pytest.param(":---", id="izquierda"),
+        pytest.param("---:", id="derecha"),
+        pytest.param(" :---: ", id="centrado"),
+    ])
+    def test_spaced_and_aligned_separators(self, separator):
+        rows = [(f"fila {i}", i) for i in range(12)]
+        lines = response_enricher._compress_table(_table(["Nombre", "Valor"], rows, separator), keep=2).split("\n")
+        assert len(lines) == 2 + 2 + 1 + 2
+        assert lines[4].startswith("... (8 filas omitidas")
+
+    def test_short_dash_runs_are_not_separators(self):
+        md = "| a | b |\n|--|--|\n" + "\n".join(f"| {i} | {i} |" for i in range(20))
+        assert response_enricher._compress_table(md, keep=2) == md
+
+    def test_short_table_is_unchanged(self):
+        md = "Resumen\n" + _table(["Municipio", "Población"], [("Goya", 102000), ("Corrientes", 409000)])
+        assert response_enricher._compress_table(md) == md
+
+    def test_non_table_text_passes_through(self):
+        md = "La inflación fue de 2,5%.\n| no es tabla\n\nSin separador | tampoco"
+        assert response_enricher._compress_table(md) == md
+
+
+class _EchoClient:
+    """Cliente LLM falso que responde con la pregunta del prompt."""
+
+    def get_response(self, messages):
+        return "enriquecida: " + messages[-1]["content"].split("PREGUNTA DEL USUARIO:\n")[1].split("\n")[0]
+
+
+class TestEnrichAsync:
+    """Enriquecimiento desde código async sobre el pool compartido."""
+
+    def test_async_single_item_uses_client_per_call(self):
+        client = _EchoClient()
+        result = asyncio.run(response_enricher.enrich_data_response_async(DATA, "ipc", client))
+        assert result == "enriquecida: ipc"
+        assert response_enricher.get_response_enricher().client is not client
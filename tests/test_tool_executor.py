@@ -1,38 +1,69 @@
 """Tests para el ejecutor de herramientas."""
-import pytest
-import sys
-import os
-from unittest.mock import MagicMock, patch
+import time
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from unittest.mock import patch
 
 from tool_executor import ToolExecutor
 
 
+class _StubDB:
+    """DatabaseTools mínimo: responde con valores fijos y registra las llamadas."""
+    
+    def __init__(self, responses):
+        # nombre de herramienta -> resultado (o excepción a lanzar)
+        self.responses = dict(responses)
+        self.calls = []
+    
+    def __getattr__(self, name):
+        if name.startswith("__") or name not in self.responses:
+            raise AttributeError(name)
+        
+        def method(**kwargs):
+            self.calls.append((name, kwargs))
+            response = self.responses[name]
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return method
+    
+    def count(self, name):
+        """Cantidad de llamadas a una herramienta."""
+        return sum(1 for called, _ in self.calls if called == name)
+
+
 class TestToolExecutorBasic:
     """Tests básicos del ToolExecutor."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def mock_db_tools(self):
-        """Mock de DatabaseTools."""
-        mock = MagicMock()
-        mock.get_ipc.return_value = "## IPC\n| Region | Valor |\n|--------|-------|\n| NEA | 2.5% |"
-        mock.get_dolar.return_value = "## Dólar Blue\n| Compra | Venta |\n|--------|-------|\n| $1100 | $1150 |"
-        mock.get_empleo.return_value = "## Empleo\n| Tasa | Valor |\n|------|-------|\n| Actividad | 41% |"
-        mock.get_censo.return_value = "## Censo\n| Municipio | Población |\n|-----------|----------|\n| Corrientes | 409000 |"
-        mock.get_censo_departamentos.return_value = "## Censo por Depto\n| Depto | Pob |\n|-------|-----|\n| Capital | 409000 |"
-        mock.get_semaforo.return_value = "## Semáforo\n🟢 Positivo"
-        mock.get_canasta_basica.return_value = "## Canasta Básica\n| CBT | CBA |\n|-----|-----|\n| $500k | $250k |"
-        mock.get_ecv.return_value = "## ECV\n| Indicador | Valor |\n|-----------|-------|\n| Empleo | 60% |"
-        mock.get_combustible.return_value = "## Combustible\n| Provincia | Ventas |\n|-----------|--------|\n| Corrientes | 1000 |"
-        mock.search_database.return_value = "Resultados de búsqueda..."
-        return mock
-    
-    @pytest.fixture
+        """Stub de DatabaseTools."""
+        stub = _StubDB({
+            "get_ipc": "## IPC\n| Region | Valor |\n|--------|-------|\n| NEA | 2.5% |",
+            "get_dolar": "## Dólar Blue\n| Compra | Venta |\n|--------|-------|\n| $1100 | $1150 |",
+            "get_empleo": "## Empleo\n| Tasa | Valor |\n|------|-------|\n| Actividad | 41% |",
+            "get_censo": "## Censo\n| Municipio | Población |\n|-----------|----------|\n| Corrientes | 409000 |",
+            "get_censo_departamentos": "## Censo por Depto\n| Depto | Pob |\n|-------|-----|\n| Capital | 409000 |",
+            "get_semaforo": "## Semáforo\n🟢 Positivo",
+            "get_canasta_basica": "## Canasta Básica\n| CBT | CBA |\n|-----|-----|\n| $500k | $250k |",
+            "get_ecv": "## ECV\n| Indicador | Valor |\n|-----------|-------|\n| Empleo | 60% |",
+            "get_combustible": "## Combustible\n| Provincia | Ventas |\n|-----------|--------|\n| Corrientes | 1000 |",
+            "search_database": "Resultados de búsqueda...",
+        })
+        return stub
+    
+    @pytest.fixture(scope="module")
     def executor(self, mock_db_tools):
-        """Crea ToolExecutor con mock de DB."""
+        """Crea ToolExecutor con stub de DB."""
         return ToolExecutor(mock_db_tools)
     
+    @pytest.fixture(autouse=True)
+    def _reset(self, executor, mock_db_tools):
+        """Limpia llamadas registradas y cache entre tests."""
+        yield
+        mock_db_tools.calls.clear()
+        executor.invalidate()
+    
     @pytest.fixture
     def executor_without_db(self):
         """Crea ToolExecutor sin DB."""
@@ -59,119 +90,134 @@ class TestToolExecutorBasic:
         assert "get_ipc" in tools
         assert "get_dolar" in tools
         assert "get_censo" in tools
+    
+    @pytest.mark.unit
+    def test_get_available_tools_returns_copy(self, executor):
+        """Modificar la lista retornada no altera las herramientas registradas."""
+        executor.get_available_tools().clear()
+        assert "get_ipc" in executor.get_available_tools()
+        assert executor.execute("get_ipc", {}).startswith("## IPC")
 
 
 class TestToolExecutorExecution:
     """Tests de ejecución de herramientas."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def mock_db_tools(self):
-        """Mock de DatabaseTools."""
-        mock = MagicMock()
-        mock.get_ipc.return_value = "## IPC Data"
-        mock.get_dolar.return_value = "## Dólar Data"
-        mock.get_empleo.return_value = "## Empleo Data"
-        mock.get_censo.return_value = "## Censo Data"
-        mock.get_censo_departamentos.return_value = "## Censo Deptos Data"
-        mock.get_semaforo.return_value = "## Semáforo Data"
-        mock.get_canasta_basica.return_value = "## Canasta Data"
-        mock.get_ecv.return_value = "## ECV Data"
-        mock.get_combustible.return_value = "## Combustible Data"
-        mock.get_patentamientos.return_value = "## Patentamientos Data"
-        mock.get_aeropuertos.return_value = "## Aeropuertos Data"
-        mock.get_oede.return_value = "## OEDE Data"
-        mock.get_pobreza.return_value = "## Pobreza Data"
-        mock.search_database.return_value = "## Search Results"
-        return mock
-    
-    @pytest.fixture
+        """Stub de DatabaseTools."""
+        stub = _StubDB({
+            "get_ipc": "## IPC Data",
+            "get_dolar": "## Dólar Data",
+            "get_empleo": "## Empleo Data",
+            "get_censo": "## Censo Data",
+            "get_censo_departamentos": "## Censo Deptos Data",
+            "get_semaforo": "## Semáforo Data",
+            "get_canasta_basica": "## Canasta Data",
+            "get_ecv": "## ECV Data",
+            "get_combustible": "## Combustible Data",
+            "get_patentamientos": "## Patentamientos Data",
+            "get_aeropuertos": "## Aeropuertos Data",
+            "get_oede": "## OEDE Data",
+            "get_pobreza": "## Pobreza Data",
+            "search_database": "## Search Results",
+        })
+        return stub
+    
+    @pytest.fixture(scope="module")
     def executor(self, mock_db_tools):
-        """Crea ToolExecutor con mock de DB."""
+        """Crea ToolExecutor con stub de DB."""
         return ToolExecutor(mock_db_tools)
     
+    @pytest.fixture(autouse=True)
+    def _reset(self, executor, mock_db_tools):
+        """Limpia llamadas registradas y cache entre tests."""
+        yield
+        mock_db_tools.calls.clear()
+        executor.invalidate()
+    
     @pytest.mark.unit
     def test_execute_get_ipc(self, executor, mock_db_tools):
         """Ejecuta get_ipc correctamente."""
         result = executor.execute("get_ipc", {})
         assert result == "## IPC Data"
-        mock_db_tools.get_ipc.assert_called_once()
+        assert mock_db_tools.calls == [("get_ipc", {})]
     
     @pytest.mark.unit
     def test_execute_get_dolar(self, executor, mock_db_tools):
         """Ejecuta get_dolar correctamente."""
         result = executor.execute("get_dolar", {"tipo": "blue"})
         assert result == "## Dólar Data"
-        mock_db_tools.get_dolar.assert_called_once_with(tipo="blue")
+        assert mock_db_tools.calls == [("get_dolar", {"tipo": "blue"})]
     
     @pytest.mark.unit
     def test_execute_get_empleo(self, executor, mock_db_tools):
         """Ejecuta get_empleo correctamente."""
         result = executor.execute("get_empleo", {"tipo": "eph"})
         assert result == "## Empleo Data"
-        mock_db_tools.get_empleo.assert_called_once_with(tipo="eph")
+        assert mock_db_tools.calls == [("get_empleo", {"tipo": "eph"})]
     
     @pytest.mark.unit
     def test_execute_get_censo(self, executor, mock_db_tools):
         """Ejecuta get_censo correctamente."""
         result = executor.execute("get_censo", {})
         assert result == "## Censo Data"
-        mock_db_tools.get_censo.assert_called_once()
+        assert mock_db_tools.calls == [("get_censo", {})]
     
     @pytest.mark.unit
     def test_execute_get_censo_departamentos(self, executor, mock_db_tools):
         """Ejecuta get_censo_departamentos correctamente."""
         result = executor.execute("get_censo_departamentos", {})
         assert result == "## Censo Deptos Data"
-        mock_db_tools.get_censo_departamentos.assert_called_once()
+        assert mock_db_tools.calls == [("get_censo_departamentos", {})]
     
     @pytest.mark.unit
     def test_execute_get_semaforo(self, executor, mock_db_tools):
         """Ejecuta get_semaforo correctamente."""
         result = executor.execute("get_semaforo", {})
         assert result == "## Semáforo Data"
-        mock_db_tools.get_semaforo.assert_called_once()
+        assert mock_db_tools.calls == [("get_semaforo", {})]
     
     @pytest.mark.unit
     def test_execute_get_canasta_basica(self, executor, mock_db_tools):
         """Ejecuta get_canasta_basica correctamente."""
         result = executor.execute("get_canasta_basica", {})
         assert result == "## Canasta Data"
-        mock_db_tools.get_canasta_basica.assert_called_once()
+        assert mock_db_tools.calls == [("get_canasta_basica", {})]
     
     @pytest.mark.unit
     def test_execute_get_ecv(self, executor, mock_db_tools):
         """Ejecuta get_ecv correctamente."""
         result = executor.execute("get_ecv", {})
         assert result == "## ECV Data"
-        mock_db_tools.get_ecv.assert_called_once()
+        assert mock_db_tools.calls == [("get_ecv", {})]
     
     @pytest.mark.unit
     def test_execute_get_patentamientos(self, executor, mock_db_tools):
         """Ejecuta get_patentamientos correctamente."""
         result = executor.execute("get_patentamientos", {})
         assert result == "## Patentamientos Data"
-        mock_db_tools.get_patentamientos.assert_called_once()
+        assert mock_db_tools.calls == [("get_patentamientos", {})]
     
     @pytest.mark.unit
     def test_execute_get_aeropuertos(self, executor, mock_db_tools):
         """Ejecuta get_aeropuertos correctamente."""
         result = executor.execute("get_aeropuertos", {})
         assert result == "## Aeropuertos Data"
-        mock_db_tools.get_aeropuertos.assert_called_once()
+        assert mock_db_tools.calls == [("get_aeropuertos", {})]
     
     @pytest.mark.unit
     def test_execute_get_oede(self, executor, mock_db_tools):
         """Ejecuta get_oede correctamente."""
         result = executor.execute("get_oede", {})
         assert result == "## OEDE Data"
-        mock_db_tools.get_oede.assert_called_once()
+        assert mock_db_tools.calls == [("get_oede", {})]
     
     @pytest.mark.unit
     def test_execute_get_pobreza(self, executor, mock_db_tools):
         """Ejecuta get_pobreza correctamente."""
         result = executor.execute("get_pobreza", {})
         assert result == "## Pobreza Data"
-        mock_db_tools.get_pobreza.assert_called_once()
+        assert mock_db_tools.calls == [("get_pobreza", {})]
 
 
 class TestToolExecutorErrors:
@@ -185,9 +231,10 @@ class TestToolExecutorErrors:
     @pytest.fixture
     def executor_with_failing_tool(self):
         """Crea ToolExecutor con herramienta que falla."""
-        mock = MagicMock()
-        mock.get_ipc.side_effect = Exception("Database error")
-        return ToolExecutor(mock)
+        stub = _StubDB({
+            "get_ipc": Exception("Database error"),
+        })
+        return ToolExecutor(stub)
     
     @pytest.mark.unit
     def test_execute_without_db_tools(self, executor_without_db):
@@ -198,11 +245,17 @@ class TestToolExecutorErrors:
     @pytest.mark.unit
     def test_execute_unknown_tool(self):
         """Retorna error para herramienta desconocida."""
-        mock = MagicMock()
-        executor = ToolExecutor(mock)
+        stub = _StubDB({})
+        executor = ToolExecutor(stub)
         result = executor.execute("unknown_tool", {})
         assert "no disponible" in result.lower() or "not" in result.lower()
     
+    @pytest.mark.unit
+    def test_execute_tool_missing_on_db_tools(self):
+        """Una herramienta registrada que db_tools no implementa no está disponible."""
+        executor = ToolExecutor(_StubDB({"get_ipc": "OK"}))
+        assert executor.execute("get_pbg", {}) == "Herramienta get_pbg no disponible"
+    
     @pytest.mark.unit
     def test_execute_handles_exception(self, executor_with_failing_tool):
         """Maneja excepciones de las herramientas."""
@@ -212,9 +265,10 @@ class TestToolExecutorErrors:
     @pytest.mark.unit
     def test_execute_with_none_args(self):
         """Maneja args=None correctamente."""
-        mock = MagicMock()
-        mock.get_ipc.return_value = "OK"
-        executor = ToolExecutor(mock)
+        stub = _StubDB({
+            "get_ipc": "OK",
+        })
+        executor = ToolExecutor(stub)
         result = executor.execute("get_ipc", None)
         assert result == "OK"
 
@@ -224,35 +278,43 @@ class TestToolExecutorArgs:
     
     @pytest.fixture
     def mock_db_tools(self):
-        """Mock de DatabaseTools."""
-        mock = MagicMock()
-        mock.get_dolar.return_value = "Dólar"
-        mock.get_empleo.return_value = "Empleo"
-        mock.get_censo.return_value = "Censo"
-        return mock
+        """Stub de DatabaseTools."""
+        stub = _StubDB({
+            "get_dolar": "Dólar",
+            "get_empleo": "Empleo",
+            "get_censo": "Censo",
+            "get_canasta_basica": "Canasta",
+        })
+        return stub
     
     @pytest.fixture
     def executor(self, mock_db_tools):
-        """Crea ToolExecutor con mock de DB."""
+        """Crea ToolExecutor con stub de DB."""
         return ToolExecutor(mock_db_tools)
     
     @pytest.mark.unit
     def test_passes_args_to_tool(self, executor, mock_db_tools):
         """Pasa argumentos correctamente a la herramienta."""
         executor.execute("get_dolar", {"tipo": "blue"})
-        mock_db_tools.get_dolar.assert_called_with(tipo="blue")
+        assert mock_db_tools.calls[-1] == ("get_dolar", {"tipo": "blue"})
     
     @pytest.mark.unit
     def test_passes_multiple_args(self, executor, mock_db_tools):
         """Pasa múltiples argumentos correctamente."""
         executor.execute("get_empleo", {"tipo": "eph", "provincia": "corrientes"})
-        mock_db_tools.get_empleo.assert_called_with(tipo="eph", provincia="corrientes")
+        assert mock_db_tools.calls[-1] == ("get_empleo", {"tipo": "eph", "provincia": "corrientes"})
     
     @pytest.mark.unit
     def test_empty_args_dict(self, executor, mock_db_tools):
         """Maneja diccionario de args vacío."""
         executor.execute("get_censo", {})
-        mock_db_tools.get_censo.assert_called_with()
+        assert mock_db_tools.calls[-1] == ("get_censo", {})
+    
+    @pytest.mark.unit
+    def test_no_arg_tool_drops_args(self, executor, mock_db_tools):
+        """Las herramientas sin parámetros ignoran los argumentos recibidos."""
+        executor.execute("get_canasta_basica", {"region": "nea"})
+        assert mock_db_tools.calls == [("get_canasta_basica", {})]
 
 
 class TestAllRegisteredTools:
@@ -261,9 +323,6 @@ class TestAllRegisteredTools:
     @pytest.mark.unit
     def test_all_tools_registered(self):
         """Todas las herramientas esperadas están registradas."""
-        mock = MagicMock()
-        executor = ToolExecutor(mock)
-        
         expected_tools = [
             "get_ipc",
             "get_dolar",
@@ -280,8 +339,92 @@ class TestAllRegisteredTools:
             "get_pobreza",
             "search_database"
         ]
+        executor = ToolExecutor(_StubDB({tool: "OK" for tool in expected_tools}))
         
         available = executor.get_available_tools()
         for tool in expected_tools:
             assert tool in available, f"Tool {tool} not registered"
+    
+    @pytest.mark.unit
+    def test_tools_missing_on_db_tools_are_not_listed(self):
+        """Solo se anuncian las herramientas que db_tools implementa."""
+        executor = ToolExecutor(_StubDB({"get_ipc": "OK", "get_dolar": "OK"}))
+        assert executor.get_available_tools() == ["get_ipc", "get_dolar"]
+        assert ToolExecutor(None).get_available_tools() == []
 
+
+
+class TestToolExecutorCache:
+    """Tests del cache de resultados."""
+    
+    @pytest.fixture
+    def mock_db_tools(self):
+        """Stub de DatabaseTools."""
+        stub = _StubDB({
+            "get_censo": "## Censo Data",
+            "get_dolar": "## Dólar Data",
+            "get_canasta_basica": "## Canasta Data",
+        })
+        return stub
+    
+    @pytest.fixture
+    def executor(self, mock_db_tools):
+        """Crea ToolExecutor con stub de DB."""
+        return ToolExecutor(mock_db_tools)
+    
+    @pytest.mark.unit
+    def test_repeated_call_hits_cache(self, executor, mock_db_tools):
+        """Una llamada repetida con los mismos args no vuelve a consultar la DB."""
+        assert executor.execute("get_censo", {"municipio": "goya"}) == "## Censo Data"
+        assert executor.execute("get_censo", {"municipio": "goya"}) == "## Censo Data"
+        assert mock_db_tools.calls == [("get_censo", {"municipio": "goya"})]
+    
+    @pytest.mark.unit
+    def test_different_args_are_separate_entries(self, executor, mock_db_tools):
+        """Args distintos generan entradas distintas."""
+        executor.execute("get_dolar", {"tipo": "blue"})
+        executor.execute("get_dolar", {"tipo": "oficial"})
+        assert mock_db_tools.count("get_dolar") == 2
+    
+    @pytest.mark.unit
+    def test_error_results_not_cached(self, executor, mock_db_tools):
+        """Los mensajes de error no se guardan en cache."""
+        mock_db_tools.responses["get_censo"] = "Error: sin conexión"
+        executor.execute("get_censo", {})
+        executor.execute("get_censo", {})
+        assert mock_db_tools.count("get_censo") == 2
+    
+    @pytest.mark.unit
+    def test_invalidate_tool(self, executor, mock_db_tools):
+        """invalidate(tool_name) descarta solo esa herramienta."""
+        executor.execute("get_censo", {})
+        executor.execute("get_dolar", {})
+        executor.invalidate("get_censo")
+        executor.execute("get_censo", {})
+        executor.execute("get_dolar", {})
+        assert mock_db_tools.count("get_censo") == 2
+        assert mock_db_tools.count("get_dolar") == 1
+    
+    @pytest.mark.unit
+    def test_no_arg_tool_ignores_args_in_cache_key(self, executor, mock_db_tools):
+        """Los argumentos descartados no generan entradas distintas."""
+        executor.execute("get_canasta_basica", None)
+        executor.execute("get_canasta_basica", {"region": "nea"})
+        assert mock_db_tools.calls == [("get_canasta_basica", {})]
+    
+    @pytest.mark.unit
+    def test_expired_entry_is_refreshed(self, executor, mock_db_tools):
+        """Una entrada vencida vuelve a consultar la DB."""
+        executor.execute("get_censo", {})
+        with patch("tool_executor.time.monotonic", return_value=time.monotonic() + 10 ** 6):
+            executor.execute("get_censo", {})
+        assert mock_db_tools.count("get_censo") == 2
+    
+    @pytest.mark.unit
+    def test_expired_entry_is_dropped_on_read(self, executor, mock_db_tools):
+        """Una entrada vencida sale del cache aunque el nuevo resultado no se guarde."""
+        executor.execute("get_censo", {})
+        mock_db_tools.responses["get_censo"] = "Error: sin conexión"
+        with patch("tool_executor.time.monotonic", return_value=time.monotonic() + 10 ** 6):
+            executor.execute("get_censo", {})
+        assert executor._cache == {}
@@ -0,0 +1,422 @@
+"""Tests para el cliente de búsqueda web (sin red: sesión HTTP falsa)."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import web_search
+from web_search import WebSearchClient, WebSearchWithSerpAPI
+
+
+class _FakeResponse:
+    """Respuesta HTTP mínima con cuerpo JSON fijo."""
+
+    def __init__(self, content=b"{}", status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=None)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _FakeSession:
+    """Sesión de requests falsa: responde siempre lo mismo y registra las llamadas."""
+
+    def __init__(self, content=b"{}", status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.closed = False
+        self.calls = []
+        self.responses = []
+
+    def _respond(self, method, url, kwargs):
+        self.calls.append((method, url, kwargs))
+        response = _FakeResponse(self.content, self.status_code)
+        self.responses.append(response)
+        return response
+
+    def get(self, url, **kwargs):
+        return self._respond("GET", url, kwargs)
+
+    def post(self, url, **kwargs):
+        return self._respond("POST", url, kwargs)
+
+    def close(self):
+        self.closed = True
+
+
+class _CountingClient(WebSearchClient):
+    """Cliente cuyo backend devuelve un resultado distinto por llamada."""
+
+    def __init__(self):
+        super().__init__(session=_FakeSession())
+        self.backend_calls = []
+
+    def _search_uncached(self, query, prefer_openai, no_cache=False):
+        self.backend_calls.append((query, prefer_openai))
+        return f"resultado {len(self.backend_calls)}"
+
+
+class TestSemanticCache:
+    """Cache de search() por palabras de contenido."""
+
+    @pytest.fixture
+    def client(self):
+        return _CountingClient()
+
+    def test_paraphrase_hits(self, client):
+        """Mayúsculas, acentos, puntuación y palabras vacías no cambian la clave."""
+        first = client.search("¿Qué es la inflación?")
+        assert client.search("que es inflacion") == first
+        assert client.search("INFLACIÓN!!") == first
+        assert len(client.backend_calls) == 1
+
+    def test_negation_misses(self, client):
+        client.search("inflación sin alimentos")
+        client.search("inflación con alimentos")
+        client.search("inflación alimentos")
+        assert len(client.backend_calls) == 3
+
+    def test_reordered_words_hit(self, client):
+        first = client.search("inflación de corrientes en enero")
+        assert client.search("enero: inflación en corrientes") == first
+        assert len(client.backend_calls) == 1
+
+    def test_extra_word_misses(self, client):
+        client.search("inflación de corrientes")
+        client.search("inflación de corrientes capital")
+        assert len(client.backend_calls) == 2
+
+    def test_single_word_change_in_long_query_misses(self, client):
+        words = "precio promedio del litro de nafta super en corrientes capital durante enero 2025".split()
+        client.search(" ".join(words))
+        client.search(" ".join(words[:-1] + ["2024"]))
+        assert len(client.backend_calls) == 2
+
+    def test_backend_preference_is_part_of_the_key(self, client):
+        client.search("dólar blue hoy", prefer_openai=False)
+        client.search("dólar blue hoy", prefer_openai=True)
+        assert client.backend_calls == [("dólar blue hoy", False), ("dólar blue hoy", True)]
+
+    def test_no_cache(self, client):
+        client.search("dólar blue hoy")
+        client.search("dólar blue hoy", no_cache=True)
+        assert len(client.backend_calls) == 2
+
+    def test_no_cache_leaves_no_entry_in_any_cache(self):
+        session = _FakeSession(b'{"AbstractText": "El IPC mide precios"}')
+        client = WebSearchClient(session=session)
+        assert "El IPC mide precios" in client.search("ipc de corrientes hoy", prefer_openai=False, no_cache=True)
+        assert "El IPC mide precios" in client.search("ipc de corrientes hoy", prefer_openai=False, no_cache=True)
+        assert len(session.calls) == 2
+        assert len(client._cache._data) == 0
+        assert len(client._semantic_cache._data) == 0
+
+    def test_semantic_key(self):
+        assert web_search._semantic_key("¿Qué es la inflación?") == frozenset({"inflacion"})
+        assert web_search._semantic_key("¿qué es?") is None
+
+
+class TestSessionOwnership:
+    """close() libera solo la sesión que armó el propio cliente."""
+
+    @pytest.fixture
+    def built(self, monkeypatch):
+        sessions = []
+
+        def build_session(retries=None):
+            sessions.append(_FakeSession())
+            return sessions[-1]
+
+        monkeypatch.setattr(web_search, "_build_session", build_session)
+        return sessions
+
+    def test_search_client_closes_session_built_for_retries(self, built):
+        with WebSearchClient("key", retries=web_search._build_retry(total=1)):
+            pass
+        assert len(built) == 1 and built[0].closed
+
+    def test_search_client_keeps_given_and_shared_sessions_open(self, built, monkeypatch):
+        session, shared = _FakeSession(), _FakeSession()
+        monkeypatch.setattr(web_search, "_shared_session", shared)
+        WebSearchClient("key", session=session, retries=web_search._build_retry(total=1)).close()
+        WebSearchClient("key").close()
+        assert not session.closed and not shared.closed
+        assert built == []
+
+    def test_serpapi_closes_only_its_own_session(self, built):
+        with WebSearchWithSerpAPI("key", retries=web_search._build_retry(total=1)):
+            pass
+        session = _FakeSession()
+        WebSearchWithSerpAPI("key", session=session, retries=web_search._build_retry(total=1)).close()
+        assert len(built) == 1 and built[0].closed
+        assert not session.closed
+
+
+class TestSerpAPI:
+    """Lectura de la respuesta de SerpAPI."""
+
+    def test_formats_results_and_releases_connection(self):
+        session = _FakeSession(b'{"organic_results": [{"title": "IPC", "snippet": "2,5%", "link": "https://x"}],'
+                               b' "search_metadata": {"id": "1"}}')
+        client = WebSearchWithSerpAPI("key", session=session)
+        result = client.search("ipc corrientes")
+        assert "1. IPC" in result
+        assert "2,5%" in result
+        assert session.responses[0].closed
+
+    @pytest.mark.skipif(web_search.msgspec is None, reason="msgspec no instalado")
+    def test_decoder_builds_only_used_fields(self):
+        body = (b'{"search_metadata": {"id": "1", "status": "Success"},'
+                b' "organic_results": [{"position": 1, "title": "IPC", "link": "https://x",'
+                b' "displayed_link": "x", "rich_snippet": {"top": {"extensions": ["a"]}}}],'
+                b' "related_questions": [{"question": "q"}]}')
+        data = web_search._decode(web_search._SERP_DECODER, body)
+        assert data == {"organic_results": [{"title": "IPC", "link": "https://x"}]}
+
+    def test_http_error_releases_connection(self):
+        session = _FakeSession(status_code=429)
+        client = WebSearchWithSerpAPI("key", session=session)
+        assert client.search("ipc corrientes") is None
+        assert session.responses[0].closed
+
+
+class _Clock:
+    """Reloj monotónico controlado por el test."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Cache TTL+LRU de resultados."""
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = _Clock()
+        monkeypatch.setattr(web_search.time, "monotonic", clock)
+        return clock
+
+    def test_entry_expires_after_ttl(self, clock):
+        cache = web_search._TTLCache(ttl=10)
+        cache.set("ipc", "resultado")
+        clock.now += 9.9
+        assert cache.get("ipc") == (True, "resultado")
+        clock.now += 0.2
+        assert cache.get("ipc") == (False, None)
+
+    def test_negative_results_use_shorter_ttl(self, clock):
+        cache = web_search._TTLCache(ttl=300, negative_ttl=15)
+        cache.set("ok", "resultado")
+        cache.set("fallo", None)
+        assert cache.get("fallo") == (True, None)
+        clock.now += 16
+        assert cache.get("fallo") == (False, None)
+        assert cache.get("ok") == (True, "resultado")
+
+    def test_evicts_least_recently_used(self, clock):
+        cache = web_search._TTLCache(maxsize=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        assert cache.get("b") == (False, None)
+        assert cache.get("a") == (True, "1")
+        assert cache.get("c") == (True, "3")
+
+    def test_concurrent_get_set(self):
+        cache = web_search._TTLCache(maxsize=64)
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(2000):
+                    key = (n + i) % 100
+                    cache.set(key, str(key))
+                    hit, value = cache.get(key)
+                    assert not hit or value == str(key)
+            except Exception as e:  # pragma: no cover - solo si hay una carrera
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(cache._data) <= 64
+
+    def test_duckduckgo_results_are_cached(self):
+        session = _FakeSession(b'{"AbstractText": "El IPC mide precios", "AbstractURL": "https://x"}')
+        client = WebSearchClient(session=session)
+        first = client.search_with_duckduckgo("IPC")
+        assert "El IPC mide precios" in first
+        assert client.search_with_duckduckgo("  ipc ") == first
+        assert len(session.calls) == 1
+
+
+class _HedgeClient(WebSearchClient):
+    """Cliente con backends falsos: OpenAI puede demorarse hasta que el test lo libera."""
+
+    QUERY = "inflación mensual en corrientes"
+
+    def __init__(self, openai_result="openai", ddg_result="ddg", openai_blocks=False):
+        super().__init__(openai_api_key="key", hedge_delay=0.05, session=_FakeSession())
+        self.openai_result = openai_result
+        self.ddg_result = ddg_result
+        self.release = threading.Event()
+        if not openai_blocks:
+            self.release.set()
+        self.openai_done = threading.Event()
+        self.openai_calls = 0
+        self.ddg_calls = 0
+
+    def search_with_openai(self, query, use_cache=True):
+        self.openai_calls += 1
+        self.release.wait(5)
+        self.openai_done.set()
+        return self.openai_result
+
+    def search_with_duckduckgo(self, query, max_results=5, use_cache=True):
+        self.ddg_calls += 1
+        return self.ddg_result
+
+
+class TestHedgedSearch:
+    """OpenAI con DuckDuckGo en paralelo cuando OpenAI se demora."""
+
+    @pytest.fixture(autouse=True)
+    def slots(self, monkeypatch):
+        slots = threading.BoundedSemaphore(1)
+        monkeypatch.setattr(web_search, "_OPENAI_SLOTS", slots)
+        return slots
+
+    def test_openai_before_delay(self):
+        client = _HedgeClient()
+        assert client.search(client.QUERY, no_cache=True) == "openai"
+        assert client.ddg_calls == 0
+
+    def test_duckduckgo_wins_after_delay(self):
+        client = _HedgeClient(openai_blocks=True)
+        try:
+            assert client.search(client.QUERY, no_cache=True) == "ddg"
+            assert client.openai_calls == 1
+            assert not client.openai_done.is_set()
+        finally:
+            client.release.set()
+
+    def test_both_fail(self):
+        client = _HedgeClient(openai_result=None, ddg_result=None)
+        assert client.search(client.QUERY, no_cache=True) is None
+        assert client.openai_calls == 1
+
+    def test_slow_openai_failure_falls_back(self):
+        client = _HedgeClient(openai_result=None, ddg_result=None, openai_blocks=True)
+        threading.Timer(0.1, client.release.set).start()
+        assert client.search(client.QUERY, no_cache=True) is None
+        assert client.openai_done.is_set()
+
+    def test_pending_openai_calls_are_bounded(self, slots):
+        client = _HedgeClient(openai_blocks=True)
+        try:
+            assert client.search(client.QUERY, no_cache=True) == "ddg"
+            # La llamada lenta sigue ocupando el único lugar: la siguiente va directo a DuckDuckGo
+            assert client.search(client.QUERY + " 2025", no_cache=True) == "ddg"
+            assert client.openai_calls == 1
+        finally:
+            client.release.set()
+        assert client.openai_done.wait(5)
+        # Al terminar, la llamada libera su lugar
+        assert slots.acquire(timeout=5)
+
+    def test_slot_released_when_submit_fails(self, slots, monkeypatch):
+        pool = ThreadPoolExecutor(max_workers=1)
+        pool.shutdown()
+        monkeypatch.setattr(web_search, "_HEDGE_POOL", pool)
+        client = _HedgeClient()
+        with pytest.raises(RuntimeError):
+            client.search(client.QUERY, no_cache=True)
+        assert slots.acquire(blocking=False)
+
+
+@pytest.mark.skipif(web_search.httpx is None, reason="httpx[http2] no instalado")
+class TestOpenAIHTTP2Client:
+    """Cliente HTTP/2 compartido para OpenAI y su política de reintentos."""
+
+    @staticmethod
+    def _client(responses, calls, retries=None):
+        """Cliente sobre httpx.MockTransport; cada respuesta es (status, Retry-After) o una excepción."""
+        httpx = web_search.httpx
+
+        def handler(request):
+            calls.append(request)
+            answer = responses[min(len(calls), len(responses)) - 1]
+            if isinstance(answer, Exception):
+                raise answer
+            status, retry_after = answer
+            headers = {"Retry-After": retry_after} if retry_after is not None else {}
+            return httpx.Response(status, headers=headers, json={"ok": status})
+
+        policy = retries or web_search._build_retry()
+        return httpx.Client(transport=web_search._RetryTransport(httpx.MockTransport(handler), policy))
+
+    @staticmethod
+    def _post(http):
+        return http.post("https://api.openai.com/v1/chat/completions", json={}).status_code
+
+    def test_clients_share_one_http2_client(self):
+        first, second = WebSearchClient("key"), WebSearchClient("key")
+        assert first._http is second._http is web_search._get_shared_openai_http()
+        first.close()
+        assert not second._http.is_closed
+
+    def test_custom_retries_build_dedicated_client(self):
+        client = WebSearchClient("key", retries=web_search._build_retry(total=1))
+        assert client._http is not web_search._get_shared_openai_http()
+        client.close()
+        assert client._http.is_closed
+
+    def test_retries_throttling_with_retry_after(self):
+        calls = []
+        assert self._post(self._client([(503, "0"), (429, "0"), (200, None)], calls)) == 200
+        assert len(calls) == 3
+
+    def test_gives_up_after_total_retries(self):
+        calls = []
+        assert self._post(self._client([(429, "0")], calls)) == 429
+        assert len(calls) == web_search._RETRY_TOTAL + 1
+
+    @pytest.mark.parametrize("status,retry_after", [
+        pytest.param(500, "0", id="5xx"),
+        pytest.param(503, None, id="sin-retry-after"),
+        pytest.param(429, "pronto", id="retry-after-invalido"),
+        pytest.param(429, "3600", id="retry-after-largo"),
+        pytest.param(401, None, id="error-del-cliente"),
+    ])
+    def test_unsafe_or_unthrottled_answers_are_not_retried(self, status, retry_after):
+        calls = []
+        assert self._post(self._client([(status, retry_after), (200, None)], calls)) == status
+        assert len(calls) == 1
+
+    def test_read_timeout_is_not_retried(self):
+        """La request pudo haberse procesado (y cobrado): no se reenvía."""
+        calls = []
+        http = self._client([web_search.httpx.ReadTimeout("lento"), (200, None)], calls)
+        with pytest.raises(web_search.httpx.ReadTimeout):
+            self._post(http)
+        assert len(calls) == 1
@@ -1,38 +1,84 @@
 """Centralized tool execution module."""
 import logging
-from typing import Any, Dict, Optional
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
 
-from mcp_tools_server import DatabaseTools
+if TYPE_CHECKING:
+    from mcp_tools_server import DatabaseTools
+
+
+# Herramientas que se pueden ejecutar (métodos de DatabaseTools con el mismo nombre)
+_TOOL_NAMES = (
+    "get_ipc",
+    "get_dolar",
+    "get_empleo",
+    "get_semaforo",
+    "get_censo",
+    "get_censo_departamentos",
+    "get_combustible",
+    "get_canasta_basica",
+    "get_ecv",
+    "get_patentamientos",
+    "get_aeropuertos",
+    "get_oede",
+    "get_pobreza",
+    "search_database",
+    # Nuevas herramientas
+    "get_emae",
+    "get_pbg",
+    "get_salarios",
+    "get_supermercados",
+    "get_construccion",
+    "get_ipc_corrientes",
+)
+
+# Herramientas que no reciben argumentos (se descartan los que lleguen)
+_NO_ARG_TOOLS = frozenset({"get_canasta_basica", "get_ipc_corrientes"})
+
+# Argumentos vacíos compartidos; solo se leen (los handlers los desempaquetan con **)
+_EMPTY_ARGS: Dict[str, Any] = {}
+
+
+def _make_exec(name: str, method: Callable[..., str]) -> Callable[[Dict[str, Any]], str]:
+    """Genera el handler que llama al método ya resuelto de DatabaseTools."""
+    if name in _NO_ARG_TOOLS:
+        def handler(args):
+            return method()
+    else:
+        def handler(args):
+            return method(**args)
+    handler.__name__ = f"_exec_{name}"
+    return handler
+
+
+# Cache de resultados: segundos de vigencia (0 desactiva) y cantidad máxima de entradas
+_CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+_CACHE_MAX_SIZE = 512
+
+# Prefijos de respuestas que no se guardan en cache (errores o sin datos)
+_UNCACHEABLE_PREFIXES = ("Error", "Lo siento", "No se encontraron")
 
 
 class ToolExecutor:
     """Ejecuta herramientas de base de datos de forma centralizada."""
     
-    def __init__(self, db_tools: Optional[DatabaseTools] = None):
+    __slots__ = ("db_tools", "_handlers", "_cache", "_cache_lock")
+    
+    def __init__(self, db_tools: Optional["DatabaseTools"] = None):
         self.db_tools = db_tools
-        self._tool_handlers = {
-            "get_ipc": self._exec_get_ipc,
-            "get_dolar": self._exec_get_dolar,
-            "get_empleo": self._exec_get_empleo,
-            "get_semaforo": self._exec_get_semaforo,
-            "get_censo": self._exec_get_censo,
-            "get_censo_departamentos": self._exec_get_censo_departamentos,
-            "get_combustible": self._exec_get_combustible,
-            "get_canasta_basica": self._exec_get_canasta_basica,
-            "get_ecv": self._exec_get_ecv,
-            "get_patentamientos": self._exec_get_patentamientos,
-            "get_aeropuertos": self._exec_get_aeropuertos,
-            "get_oede": self._exec_get_oede,
-            "get_pobreza": self._exec_get_pobreza,
-            "search_database": self._exec_search_database,
-            # Nuevas herramientas
-            "get_emae": self._exec_get_emae,
-            "get_pbg": self._exec_get_pbg,
-            "get_salarios": self._exec_get_salarios,
-            "get_supermercados": self._exec_get_supermercados,
-            "get_construccion": self._exec_get_construccion,
-            "get_ipc_corrientes": self._exec_get_ipc_corrientes,
-        }
+        # nombre -> handler(args) con el método de db_tools ya resuelto
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+        if db_tools is not None:
+            for name in _TOOL_NAMES:
+                method = getattr(db_tools, name, None)
+                if method is not None:
+                    self._handlers[name] = _make_exec(name, method)
+        # (tool_name, args ordenados) -> (timestamp monotónico, resultado)
+        self._cache: Dict[Tuple, Tuple[float, str]] = {}
+        # El router puede ejecutar herramientas desde varios hilos a la vez
+        self._cache_lock = threading.Lock()
     
     def execute(self, tool_name: str, tool_args: Optional[Dict[str, Any]] = None) -> str:
         """
@@ -48,85 +94,80 @@ class ToolExecutor:
         if not self.db_tools:
             return "Error: Herramientas de base de datos no disponibles"
         
-        tool_args = tool_args or {}
-        handler = self._tool_handlers.get(tool_name)
-        
-        if not handler:
-            logging.warning(f"Tool not found: {tool_name}")
+        handler = self._handlers.get(tool_name)
+        if handler is None:
+            logging.warning("Tool not found: %s", tool_name)
             return f"Herramienta {tool_name} no disponible"
         
+        # Las herramientas sin parámetros comparten la misma entrada de cache
+        if not tool_args or tool_name in _NO_ARG_TOOLS:
+            tool_args = _EMPTY_ARGS
+        
+        key = self._cache_key(tool_name, tool_args)
+        if key is not None:
+            entry = self._cache.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[0] < _CACHE_TTL:
+                    logging.debug("Cache hit for tool %s", tool_name)
+                    return entry[1]
+                # Vencida: se descarta ahora y no recién cuando la desaloje el límite de tamaño
+                with self._cache_lock:
+                    if self._cache.get(key) is entry:
+                        del self._cache[key]
+        
         try:
-            logging.info(f"Executing tool {tool_name} with args {tool_args}")
-            return handler(tool_args)
+            logging.info("Executing tool %s with args %s", tool_name, tool_args)
+            result = handler(tool_args)
         except Exception as e:
-            logging.error(f"Error executing tool {tool_name}: {e}", exc_info=True)
+            logging.error("Error executing tool %s: %s", tool_name, e, exc_info=True)
             return "Lo siento, hubo un error al obtener los datos. Por favor intenta de nuevo."
-    
-    def _exec_get_ipc(self, args: Dict) -> str:
-        return self.db_tools.get_ipc(**args)
-    
-    def _exec_get_dolar(self, args: Dict) -> str:
-        return self.db_tools.get_dolar(**args)
-    
-    def _exec_get_empleo(self, args: Dict) -> str:
-        return self.db_tools.get_empleo(**args)
-    
-    def _exec_get_semaforo(self, args: Dict) -> str:
-        return self.db_tools.get_semaforo(**args)
-    
-    def _exec_get_censo(self, args: Dict) -> str:
-        return self.db_tools.get_censo(**args)
-    
-    def _exec_get_censo_departamentos(self, args: Dict) -> str:
-        return self.db_tools.get_censo_departamentos(**args)
-    
-    def _exec_get_combustible(self, args: Dict) -> str:
-        return self.db_tools.get_combustible(**args)
-    
-    def _exec_get_canasta_basica(self, args: Dict) -> str:
-        return self.db_tools.get_canasta_basica()
-    
-    def _exec_get_ecv(self, args: Dict) -> str:
-        return self.db_tools.get_ecv(**args)
-    
-    def _exec_get_patentamientos(self, args: Dict) -> str:
-        return self.db_tools.get_patentamientos(**args)
-    
-    def _exec_get_aeropuertos(self, args: Dict) -> str:
-        return self.db_tools.get_aeropuertos(**args)
-    
-    def _exec_get_oede(self, args: Dict) -> str:
-        return self.db_tools.get_oede(**args)
-    
-    def _exec_get_pobreza(self, args: Dict) -> str:
-        return self.db_tools.get_pobreza(**args)
-    
-    def _exec_search_database(self, args: Dict) -> str:
-        return self.db_tools.search_database(**args)
-    
-    def _exec_get_emae(self, args: Dict) -> str:
-        return self.db_tools.get_emae(**args)
-    
-    def _exec_get_pbg(self, args: Dict) -> str:
-        return self.db_tools.get_pbg(**args)
-    
-    def _exec_get_salarios(self, args: Dict) -> str:
-        return self.db_tools.get_salarios(**args)
-    
-    def _exec_get_supermercados(self, args: Dict) -> str:
-        return self.db_tools.get_supermercados(**args)
-    
-    def _exec_get_construccion(self, args: Dict) -> str:
-        return self.db_tools.get_construccion(**args)
-    
-    def _exec_get_ipc_corrientes(self, args: Dict) -> str:
-        return self.db_tools.get_ipc_corrientes()
+        
+        if key is not None and isinstance(result, str) and not result.startswith(_UNCACHEABLE_PREFIXES):
+            self._store(key, result)
+        return result
+    
+    @staticmethod
+    def _cache_key(tool_name: str, tool_args: Dict[str, Any]) -> Optional[Tuple]:
+        """Clave de cache para una llamada; None si no se debe cachear."""
+        if _CACHE_TTL <= 0:
+            return None
+        if not tool_args:
+            return (tool_name, ())
+        key = (tool_name, tuple(sorted(tool_args.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # Argumentos no hasheables (listas, dicts): se ejecuta sin cache
+            return None
+        return key
+    
+    def _store(self, key: Tuple, result: str):
+        """Guarda un resultado descartando la entrada más antigua si se llenó el cache."""
+        cache = self._cache
+        with self._cache_lock:
+            cache.pop(key, None)
+            if len(cache) >= _CACHE_MAX_SIZE:
+                del cache[next(iter(cache))]
+            cache[key] = (time.monotonic(), result)
+    
+    def invalidate(self, tool_name: Optional[str] = None):
+        """
+        Limpia el cache de resultados.
+        
+        Args:
+            tool_name: Si se indica, solo se descartan las entradas de esa herramienta
+        """
+        with self._cache_lock:
+            if tool_name is None:
+                self._cache.clear()
+                return
+            for key in [k for k in self._cache if k[0] == tool_name]:
+                del self._cache[key]
     
     def is_available(self) -> bool:
         """Verifica si las herramientas están disponibles."""
         return self.db_tools is not None
     
     def get_available_tools(self) -> list:
-        """Retorna lista de herramientas disponibles."""
-        return list(self._tool_handlers.keys())
-
+        """Retorna lista de herramientas disponibles (las que db_tools implementa)."""
+        return list(self._handlers)
@@ -1,77 +1,518 @@
 """Web search module using OpenAI function calling and alternative search APIs."""
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+import os
+import re
+import socket
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Hashable, List, Optional, Any, Tuple, TypedDict
 import json
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Serializador/parser JSON acelerado si está disponible
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - depende del entorno
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+    _json_loads = json.loads
+
+# Decodificador tipado (opcional): descarta en C los campos que no están en el esquema
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - depende del entorno
+    msgspec = None
+
+# Cliente HTTP/2 (opcional): multiplexa las dos llamadas a OpenAI sobre una conexión
+try:
+    import httpx
+    import h2  # noqa: F401 - requerido por httpx para http2=True
+except ImportError:  # pragma: no cover - depende del entorno
+    httpx = None
+
+# Pool compartido para correr las búsquedas bloqueantes desde código async
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("WEB_SEARCH_WORKERS", "8")))
+
+# Pool aparte para la búsqueda con cobertura (hedging): sus tareas se lanzan desde
+# hilos de _POOL, y compartir el pool podría dejarlas esperando sin workers libres
+_HEDGE_WORKERS = int(os.getenv("WEB_SEARCH_HEDGE_WORKERS", "8"))
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=_HEDGE_WORKERS)
+
+# Llamadas a OpenAI en curso dentro de _HEDGE_POOL. Un future que ya corre no se puede
+# cancelar: si gana DuckDuckGo, la llamada a OpenAI sigue hasta su timeout de lectura
+# (y su resultado queda en el cache). El tope deja la otra mitad del pool para DuckDuckGo.
+_OPENAI_SLOTS = threading.BoundedSemaphore(max(1, _HEDGE_WORKERS // 2))
+
+# Segundos que se espera a OpenAI antes de lanzar DuckDuckGo en paralelo
+_HEDGE_DELAY = 2.0
+
+# Vigencia (segundos) de los resultados cacheados; los fallos (None) se recuerdan menos tiempo
+_CACHE_TTL = float(os.getenv("WEB_SEARCH_CACHE_TTL", "300"))
+_NEGATIVE_CACHE_TTL = 15.0
+_CACHE_MAX_SIZE = 256
+
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a TTL."""
+    
+    def __init__(self, maxsize: int = _CACHE_MAX_SIZE, ttl: float = _CACHE_TTL,
+                 negative_ttl: float = _NEGATIVE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (expires_at, value)
+        self._data: "OrderedDict[Hashable, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Tuple[bool, Optional[str]]:
+        """Return (hit, value); value may be a cached None (recent failure)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, entry[1]
+    
+    def set(self, key: Hashable, value: Optional[str]):
+        """Store a value, evicting the least recently used entry when full."""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+
+# Cache semántico: consultas que solo difieren en mayúsculas, acentos, puntuación,
+# palabras vacías u orden de las palabras reutilizan el resultado. La clave es el
+# conjunto exacto de palabras de contenido: cualquier otra palabra es otra consulta.
+_SEMANTIC_MAX_SIZE = 512
+_WORD_RE = re.compile(r"\w+")
+# "con"/"sin" no son vacías: cambian el sentido de la consulta
+_STOP_WORDS = frozenset({
+    'que', 'es', 'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'al',
+    'en', 'por', 'para', 'sobre', 'y', 'o', 'a', 'me', 'se', 'lo', 'le',
+    'the', 'of', 'in', 'on', 'for', 'and', 'to', 'is', 'what', "s"
+})
+
+
+def _semantic_key(query: str) -> Optional[FrozenSet[str]]:
+    """Normalize a query to the set of its content words (None if it has none)."""
+    text = unicodedata.normalize("NFKD", query.lower()).encode("ascii", "ignore").decode()
+    words = frozenset(_WORD_RE.findall(text)) - _STOP_WORDS
+    return words or None
+
+
+# Consultas que la Instant Answer de DuckDuckGo resuelve sola (URLs, definiciones, personas)
+_BYPASS_RE = re.compile(r"^(?:https?://|qu[eé] es |qui[eé]n es |definici[oó]n de )", re.IGNORECASE)
+_BYPASS_MAX_TOKENS = 2
+
+
+def _bypass_openai(query: str) -> bool:
+    """Whether a query is simple enough to skip OpenAI and go straight to DuckDuckGo."""
+    query = query.strip()
+    return len(query.split()) <= _BYPASS_MAX_TOKENS or _BYPASS_RE.match(query) is not None
+
+
+def _cache_query(query: str) -> str:
+    """Normalize a query for use as cache key."""
+    return query.strip().lower()
+
+
+# Parámetros fijos de las llamadas a OpenAI (solo se copian, nunca se modifican)
+_OPENAI_PARAMS = MappingProxyType({
+    "model": "gpt-4o-mini",
+    "temperature": 0.7,
+    "max_tokens": 2000
+})
+_WEB_SEARCH_TOOLS = (
+    {
+        "type": "function",
+        "function": {
+            "name": "web_search",
+            "description": "Search the web for current information",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "The search query"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    },
+)
+_TOOL_CALL_PARAMS = MappingProxyType({
+    **_OPENAI_PARAMS,
+    "tools": _WEB_SEARCH_TOOLS,
+    "tool_choice": "auto"
+})
+
+
+def _payload_prefix(params: MappingProxyType) -> bytes:
+    """Serialize the static part of a payload once, without its closing brace."""
+    return _json_dumps(dict(params))[:-1] + b',"messages":'
+
+
+# Parte fija de cada payload ya serializada: por llamada solo se codifican los mensajes
+_OPENAI_PREFIX = _payload_prefix(_OPENAI_PARAMS)
+_TOOL_CALL_PREFIX = _payload_prefix(_TOOL_CALL_PARAMS)
+
+
+class _DDGTopic(TypedDict, total=False):
+    Text: Any
+    FirstURL: Any
+
+
+class _DDGResponse(TypedDict, total=False):
+    AbstractText: Any
+    AbstractURL: Any
+    Definition: Any
+    DefinitionURL: Any
+    RelatedTopics: List[_DDGTopic]
+
+
+class _SerpSource(TypedDict, total=False):
+    link: Any
+
+
+class _SerpAnswerBox(TypedDict, total=False):
+    answer: Any
+    snippet: Any
+    result: Any
+    link: Any
+
+
+class _SerpKnowledgeGraph(TypedDict, total=False):
+    description: Any
+    source: _SerpSource
+
+
+class _SerpEntry(TypedDict, total=False):
+    title: Any
+    snippet: Any
+    link: Any
+
+
+class _SerpResponse(TypedDict, total=False):
+    answer_box: _SerpAnswerBox
+    knowledge_graph: _SerpKnowledgeGraph
+    organic_results: List[_SerpEntry]
+    news_results: List[_SerpEntry]
+
+
+# Decoders por esquema: solo se materializan los campos usados al armar los resultados
+_DDG_DECODER = msgspec.json.Decoder(_DDGResponse) if msgspec else None
+_SERP_DECODER = msgspec.json.Decoder(_SerpResponse) if msgspec else None
+
+
+def _decode(decoder: Any, content: bytes) -> Dict[str, Any]:
+    """Decode a response body with a schema decoder, falling back to plain JSON."""
+    if decoder is not None:
+        try:
+            return decoder.decode(content)
+        except msgspec.ValidationError:
+            # La respuesta no respeta el esquema (p. ej. un tipo inesperado): parseo genérico
+            pass
+    return _json_loads(content)
+
+
+def _format_entry(head: str, snippet: str, link: str, indent: str) -> str:
+    """Format one search result: the heading, then the snippet and link lines when present."""
+    if snippet and link:
+        return f"{head}\n{indent}{snippet}\n{indent}🔗 {link}"
+    if snippet:
+        return f"{head}\n{indent}{snippet}"
+    if link:
+        return f"{head}\n{indent}🔗 {link}"
+    return head
+
+
+# TCP keep-alive en los sockets del pool: detecta conexiones muertas entre ráfagas de búsquedas
+_KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 15), ("TCP_KEEPCNT", 4))
+    if hasattr(socket, name)
+]
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections enable TCP keep-alive probes."""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", _KEEPALIVE_SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+
+# Timeouts (conexión, lectura): DNS+TCP+TLS acotados por separado de la espera de la respuesta
+_CONNECT_TIMEOUT = 3.05
+_OPENAI_TIMEOUT = (_CONNECT_TIMEOUT, 27.0)
+_DDG_TIMEOUT = (_CONNECT_TIMEOUT, 7.0)
+_SERP_TIMEOUT = (_CONNECT_TIMEOUT, 17.0)
+
+# Reintentos ante fallas transitorias (backoff exponencial, respeta Retry-After en 429/503)
+_RETRY_TOTAL = 3
+_RETRY_CONNECT = 2
+_RETRY_READ = 1
+_RETRY_BACKOFF = 0.5
+
+
+def _build_retry(total: int = _RETRY_TOTAL, connect: int = _RETRY_CONNECT, read: int = _RETRY_READ,
+                 backoff_factor: float = _RETRY_BACKOFF) -> Retry:
+    """Create the retry policy mounted on the HTTP sessions."""
+    return Retry(
+        total=total,
+        connect=connect,
+        read=read,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        # Agotados los reintentos se devuelve la última respuesta y raise_for_status la reporta
+        raise_on_status=False,
+    )
+
+
+def _build_session(retries: Optional[Retry] = None) -> requests.Session:
+    """Create an HTTP session with a keep-alive connection pool and retries on transient errors."""
+    session = requests.Session()
+    adapter = _KeepAliveAdapter(
+        pool_connections=4,
+        pool_maxsize=20,
+        max_retries=retries or _build_retry(),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+# Sesión compartida por todos los clientes del proceso (un solo pool de conexiones)
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def _get_shared_session() -> requests.Session:
+    """Return the process-wide HTTP session, creating it on first use."""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = _build_session()
+    return _shared_session
+
+
+# Espera máxima (segundos) que se acepta de un Retry-After antes de reintentar
+_RETRY_AFTER_MAX = 10.0
+
+
+if httpx is not None:
+    class _RetryTransport(httpx.BaseTransport):
+        """httpx transport that retries throttled OpenAI requests only when it is safe.
+        
+        Connection errors are retried by the wrapped HTTPTransport (nothing was sent
+        yet). A read timeout or a 5xx may mean OpenAI already processed, and billed,
+        the request, so only 429/503 answers with a valid Retry-After are retried.
+        """
+        
+        _RETRY_STATUSES = frozenset({429, 503})
+        
+        def __init__(self, transport: "httpx.BaseTransport", retries: Retry):
+            self._transport = transport
+            self._retries = retries
+        
+        def _retry_after(self, response: "httpx.Response") -> Optional[float]:
+            """Seconds the server asked to wait, or None when absent, invalid or too long."""
+            header = response.headers.get("Retry-After")
+            if not header or not self._retries.respect_retry_after_header:
+                return None
+            try:
+                delay = self._retries.parse_retry_after(header)
+            except (InvalidHeader, ValueError, OverflowError):
+                return None
+            return delay if delay <= _RETRY_AFTER_MAX else None
+        
+        def handle_request(self, request: "httpx.Request") -> "httpx.Response":
+            remaining = self._retries.total or 0
+            while True:
+                response = self._transport.handle_request(request)
+                if not remaining or response.status_code not in self._RETRY_STATUSES:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    return response
+                response.close()
+                remaining -= 1
+                time.sleep(delay)
+        
+        def close(self):
+            self._transport.close()
+
+
+def _build_openai_http(retries: Optional[Retry] = None) -> Optional["httpx.Client"]:
+    """Create an HTTP/2 client for the OpenAI API, or None when httpx[http2] is not installed."""
+    if httpx is None:
+        return None
+    connect, read = _OPENAI_TIMEOUT
+    retries = retries or _build_retry()
+    transport = httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        # httpx reintenta solo los errores de conexión, con el presupuesto de la política
+        retries=retries.total if retries.connect is None else retries.connect,
+    )
+    return httpx.Client(
+        timeout=httpx.Timeout(read, connect=connect),
+        transport=_RetryTransport(transport, retries),
+    )
+
+
+# Cliente HTTP/2 compartido por todos los WebSearchClient (una conexión multiplexada)
+_shared_openai_http: Optional["httpx.Client"] = None
+_shared_openai_http_lock = threading.Lock()
+
+
+def _get_shared_openai_http() -> Optional["httpx.Client"]:
+    """Return the process-wide HTTP/2 client, creating it on first use (None without httpx)."""
+    global _shared_openai_http
+    if _shared_openai_http is None and httpx is not None:
+        with _shared_openai_http_lock:
+            if _shared_openai_http is None:
+                _shared_openai_http = _build_openai_http()
+    return _shared_openai_http
 
 
 class WebSearchClient:
     """Manages web search using OpenAI function calling and alternative APIs."""
     
-    def __init__(self, openai_api_key: Optional[str] = None):
+    def __init__(self, openai_api_key: Optional[str] = None, hedge_delay: float = _HEDGE_DELAY,
+                 session: Optional[requests.Session] = None,
+                 openai_timeout: Tuple[float, float] = _OPENAI_TIMEOUT,
+                 ddg_timeout: Tuple[float, float] = _DDG_TIMEOUT,
+                 retries: Optional[Retry] = None):
         """Initialize web search client.
         
         Args:
             openai_api_key: OpenAI API key for using OpenAI's web search capabilities
+            hedge_delay: Seconds to wait for OpenAI before also starting DuckDuckGo
+            session: HTTP session to use (defaults to the process-wide shared session)
+            openai_timeout: (connect, read) timeout in seconds for OpenAI requests
+            ddg_timeout: (connect, read) timeout in seconds for DuckDuckGo requests
+            retries: Retry policy (see _build_retry); builds a dedicated session and
+                HTTP/2 client when given
         """
         self.openai_api_key = openai_api_key
+        self.hedge_delay = hedge_delay
+        self.openai_timeout = openai_timeout
+        self.ddg_timeout = ddg_timeout
         self.base_url = "https://api.openai.com/v1/chat/completions"
+        # Sesión compartida entre clientes (evita un handshake TCP+TLS por request y por cliente)
+        self._session = session or (_build_session(retries) if retries else _get_shared_session())
+        # Solo la sesión propia (armada por la política de reintentos) se cierra en close()
+        self._owns_session = session is None and retries is not None
+        # Cliente HTTP/2 para OpenAI, compartido salvo política de reintentos propia;
+        # sin httpx se usa la sesión de requests (HTTP/1.1)
+        self._owns_http = retries is not None
+        self._http = _build_openai_http(retries) if retries else _get_shared_openai_http()
+        if self._http is not None:
+            self._http_timeout = httpx.Timeout(openai_timeout[1], connect=openai_timeout[0])
+        # Headers de OpenAI armados una vez; se pasan por request para no enviarlos a DuckDuckGo
+        self._openai_headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {openai_api_key}"
+        }
+        # Resultados recientes por (backend, consulta normalizada, parámetros)
+        self._cache = _TTLCache()
+        # Resultados de search() por (backend preferido, palabras de contenido de la consulta)
+        self._semantic_cache = _TTLCache(maxsize=_SEMANTIC_MAX_SIZE)
+    
+    def close(self):
+        """Release the connections owned by this client (the shared ones stay open)."""
+        if self._owns_session:
+            self._session.close()
+        if self._owns_http and self._http is not None:
+            self._http.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _post_openai(self, prefix: bytes, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """POST a chat completion (pre-serialized prefix + messages) and return the decoded response."""
+        body = prefix + _json_dumps(messages) + b"}"
+        if self._http is not None:
+            response = self._http.post(self.base_url, headers=self._openai_headers, content=body,
+                                       timeout=self._http_timeout)
+        else:
+            response = self._session.post(self.base_url, headers=self._openai_headers, data=body,
+                                          timeout=self.openai_timeout)
+        response.raise_for_status()
+        return _json_loads(response.content)
     
-    def search_with_openai(self, query: str) -> Optional[str]:
+    def search_with_openai(self, query: str, use_cache: bool = True) -> Optional[str]:
         """Search the web using OpenAI's function calling with web_search tool.
         
         Args:
             query: Search query string
+            use_cache: If False, neither read nor store the result in the cache
             
         Returns:
             Search results as formatted string, or None if failed
         """
+        if not use_cache:
+            return self._search_with_openai(query)
+        key = ("openai", _cache_query(query))
+        hit, result = self._cache.get(key)
+        if hit:
+            return result
+        result = self._search_with_openai(query)
+        self._cache.set(key, result)
+        return result
+    
+    def _search_with_openai(self, query: str) -> Optional[str]:
+        """Uncached OpenAI search (see search_with_openai)."""
         if not self.openai_api_key:
             return None
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.openai_api_key}"
-        }
-        
         # Usar OpenAI con function calling para búsqueda web
-        payload = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {
-                    "role": "user",
-                    "content": f"Busca información actualizada sobre: {query}"
-                }
-            ],
-            "tools": [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": "web_search",
-                        "description": "Search the web for current information",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "query": {
-                                    "type": "string",
-                                    "description": "The search query"
-                                }
-                            },
-                            "required": ["query"]
-                        }
-                    }
-                }
-            ],
-            "tool_choice": "auto",
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
+        messages = [
+            {
+                "role": "user",
+                "content": f"Busca información actualizada sobre: {query}"
+            }
+        ]
         
         try:
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._post_openai(_TOOL_CALL_PREFIX, messages)
             
             # Procesar la respuesta
             if 'choices' in data and len(data['choices']) > 0:
@@ -82,11 +523,11 @@ class WebSearchClient:
                     # OpenAI ejecutó la búsqueda web, obtener el resultado
                     tool_call = choice['message']['tool_calls'][0]
                     if 'function' in tool_call and 'arguments' in tool_call['function']:
-                        function_args = json.loads(tool_call['function']['arguments'])
+                        function_args = _json_loads(tool_call['function']['arguments'])
                         search_query = function_args.get('query')
                         
                         # Ejecutar búsqueda real con DuckDuckGo
-                        logging.info(f"Executing actual web search for: {search_query}")
+                        logger.info("Executing actual web search for: %s", search_query)
                         search_results = self.search_with_duckduckgo(search_query)
                         
                         if not search_results:
@@ -108,16 +549,7 @@ class WebSearchClient:
                         ]
                         
                         # Segunda llamada para obtener la respuesta final
-                        payload2 = {
-                            "model": "gpt-4o-mini",
-                            "messages": messages,
-                            "temperature": 0.7,
-                            "max_tokens": 2000
-                        }
-                        
-                        response2 = requests.post(self.base_url, headers=headers, json=payload2, timeout=30)
-                        response2.raise_for_status()
-                        data2 = response2.json()
+                        data2 = self._post_openai(_OPENAI_PREFIX, messages)
                         
                         if 'choices' in data2 and len(data2['choices']) > 0:
                             return data2['choices'][0]['message']['content']
@@ -129,19 +561,33 @@ class WebSearchClient:
             return None
             
         except Exception as e:
-            logging.warning(f"Error using OpenAI web search: {e}")
+            logger.warning("Error using OpenAI web search: %s", e)
             return None
     
-    def search_with_duckduckgo(self, query: str, max_results: int = 5) -> Optional[str]:
+    def search_with_duckduckgo(self, query: str, max_results: int = 5,
+                               use_cache: bool = True) -> Optional[str]:
         """Search the web using DuckDuckGo (free, no API key required).
         
         Args:
             query: Search query string
             max_results: Maximum number of results to return
+            use_cache: If False, neither read nor store the result in the cache
             
         Returns:
             Formatted search results, or None if failed
         """
+        if not use_cache:
+            return self._search_with_duckduckgo(query, max_results)
+        key = ("duckduckgo", _cache_query(query), max_results)
+        hit, result = self._cache.get(key)
+        if hit:
+            return result
+        result = self._search_with_duckduckgo(query, max_results)
+        self._cache.set(key, result)
+        return result
+    
+    def _search_with_duckduckgo(self, query: str, max_results: int) -> Optional[str]:
+        """Uncached DuckDuckGo search (see search_with_duckduckgo)."""
         try:
             # DuckDuckGo Instant Answer API (gratis, sin API key)
             url = "https://api.duckduckgo.com/"
@@ -152,31 +598,32 @@ class WebSearchClient:
                 "skip_disambig": "1"
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = self._session.get(url, params=params, timeout=self.ddg_timeout)
             response.raise_for_status()
-            data = response.json()
+            data = _decode(_DDG_DECODER, response.content)
             
             results = []
             
             # Extraer respuesta directa si existe
             if data.get('AbstractText'):
-                results.append(f"📄 {data['AbstractText']}")
                 if data.get('AbstractURL'):
-                    results.append(f"Fuente: {data['AbstractURL']}")
+                    results.append(f"📄 {data['AbstractText']}\nFuente: {data['AbstractURL']}")
+                else:
+                    results.append(f"📄 {data['AbstractText']}")
             
-            # Extraer temas relacionados
-            if data.get('RelatedTopics'):
-                for topic in data['RelatedTopics'][:max_results]:
-                    if isinstance(topic, dict) and 'Text' in topic:
-                        results.append(f"• {topic['Text']}")
-                        if 'FirstURL' in topic:
-                            results.append(f"  {topic['FirstURL']}")
+            # Extraer temas relacionados (texto y, si existe, su URL)
+            results.extend(
+                f"• {topic['Text']}\n  {topic['FirstURL']}" if 'FirstURL' in topic else f"• {topic['Text']}"
+                for topic in (data.get('RelatedTopics') or ())[:max_results]
+                if isinstance(topic, dict) and 'Text' in topic
+            )
             
             # Extraer definiciones
             if data.get('Definition'):
-                results.append(f"📖 Definición: {data['Definition']}")
                 if data.get('DefinitionURL'):
-                    results.append(f"Fuente: {data['DefinitionURL']}")
+                    results.append(f"📖 Definición: {data['Definition']}\nFuente: {data['DefinitionURL']}")
+                else:
+                    results.append(f"📖 Definición: {data['Definition']}")
             
             if results:
                 return "\n".join(results)
@@ -184,34 +631,108 @@ class WebSearchClient:
             return None
             
         except Exception as e:
-            logging.warning(f"Error using DuckDuckGo search: {e}")
+            logger.warning("Error using DuckDuckGo search: %s", e)
             return None
     
-    def search(self, query: str, prefer_openai: bool = True) -> Optional[str]:
+    def search(self, query: str, prefer_openai: bool = True, no_cache: bool = False) -> Optional[str]:
         """Search the web using available methods.
         
         Args:
             query: Search query string
             prefer_openai: If True, try OpenAI first, then DuckDuckGo. If False, use DuckDuckGo only.
+            no_cache: If True, bypass every cache layer: nothing is read from or
+                stored in them (e.g. for sensitive prompts)
             
         Returns:
             Formatted search results, or None if all methods failed
         """
-        # Intentar con OpenAI si está disponible y preferido
-        if prefer_openai and self.openai_api_key:
-            result = self.search_with_openai(query)
+        words = None if no_cache else _semantic_key(query)
+        key = (prefer_openai, words)
+        if words is not None:
+            hit, cached = self._semantic_cache.get(key)
+            if hit:
+                logger.info("Web search served from semantic cache")
+                return cached
+        
+        result = self._search_uncached(query, prefer_openai, no_cache)
+        # Solo resultados válidos: un fallo no debe tapar la consulta parafraseada
+        if result and words is not None:
+            self._semantic_cache.set(key, result)
+        return result
+    
+    def _search_uncached(self, query: str, prefer_openai: bool, no_cache: bool = False) -> Optional[str]:
+        """Run the OpenAI -> DuckDuckGo fallback chain (see search)."""
+        # Con no_cache tampoco se usan los caches por backend
+        use_cache = not no_cache
+        ddg_tried = False
+        
+        # Consultas triviales: DuckDuckGo primero, sin el round-trip ni los tokens de OpenAI
+        if prefer_openai and _bypass_openai(query):
+            result = self.search_with_duckduckgo(query, use_cache=use_cache)
+            ddg_tried = True
             if result:
-                logging.info("Web search successful using OpenAI")
+                logger.info("Web search successful using DuckDuckGo (bypass)")
                 return result
         
-        # Fallback a DuckDuckGo
-        result = self.search_with_duckduckgo(query)
+        # Intentar con OpenAI si está disponible y preferido
+        if prefer_openai and self.openai_api_key and not _OPENAI_SLOTS.acquire(blocking=False):
+            # Demasiadas llamadas lentas a OpenAI acumuladas: no sumar otra, ir directo a DuckDuckGo
+            logger.warning("OpenAI web search saturated, using DuckDuckGo")
+        elif prefer_openai and self.openai_api_key:
+            try:
+                openai_future = _HEDGE_POOL.submit(self.search_with_openai, query, use_cache=use_cache)
+            except Exception:
+                # p. ej. pool cerrado al salir el intérprete: sin esto el cupo se pierde para siempre
+                _OPENAI_SLOTS.release()
+                raise
+            openai_future.add_done_callback(lambda _: _OPENAI_SLOTS.release())
+            try:
+                result = openai_future.result(timeout=self.hedge_delay)
+            except FutureTimeout:
+                # OpenAI viene lento: correr DuckDuckGo en paralelo y quedarse con el primero que responda
+                ddg_future = _HEDGE_POOL.submit(self.search_with_duckduckgo, query, use_cache=use_cache)
+                ddg_tried = True
+                pending = {openai_future, ddg_future}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result() if future.exception() is None else None
+                        if result:
+                            # Solo cancela lo que todavía no arrancó; OpenAI en curso sigue (ver _OPENAI_SLOTS)
+                            for other in pending:
+                                other.cancel()
+                            backend = "OpenAI" if future is openai_future else "DuckDuckGo"
+                            logger.info("Web search successful using %s (hedged)", backend)
+                            return result
+            else:
+                if result:
+                    logger.info("Web search successful using OpenAI")
+                    return result
+        
+        # Fallback a DuckDuckGo (si ya se intentó, responde el cache; sin cache no se repite)
+        if ddg_tried and no_cache:
+            result = None
+        else:
+            result = self.search_with_duckduckgo(query, use_cache=use_cache)
         if result:
-            logging.info("Web search successful using DuckDuckGo")
+            logger.info("Web search successful using DuckDuckGo")
             return result
         
-        logging.warning("All web search methods failed")
+        logger.warning("All web search methods failed")
         return None
+    
+    async def search_async(self, query: str, prefer_openai: bool = True) -> Optional[str]:
+        """Async variant of search() that runs on the shared thread pool.
+        
+        Args:
+            query: Search query string
+            prefer_openai: Same as in search()
+            
+        Returns:
+            Formatted search results, or None if all methods failed
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_POOL, self.search, query, prefer_openai)
 
 
 class WebSearchWithSerpAPI:
@@ -220,14 +741,36 @@ class WebSearchWithSerpAPI:
     SerpAPI provides Google Search results. Requires SERP_API_KEY in environment.
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, session: Optional[requests.Session] = None,
+                 timeout: Tuple[float, float] = _SERP_TIMEOUT, retries: Optional[Retry] = None):
         """Initialize SerpAPI client.
         
         Args:
             api_key: SerpAPI key (optional, can be None if not using SerpAPI)
+            session: HTTP session to use (defaults to the process-wide shared session)
+            timeout: (connect, read) timeout in seconds for SerpAPI requests
+            retries: Retry policy (see _build_retry); builds a dedicated session when given
         """
         self.api_key = api_key
+        self.timeout = timeout
         self.base_url = "https://serpapi.com/search"
+        # Sesión compartida entre clientes (evita un handshake TCP+TLS por request y por cliente)
+        self._session = session or (_build_session(retries) if retries else _get_shared_session())
+        # Solo la sesión propia (armada por la política de reintentos) se cierra en close()
+        self._owns_session = session is None and retries is not None
+        # Resultados recientes por (consulta normalizada, cantidad de resultados)
+        self._cache = _TTLCache()
+    
+    def close(self):
+        """Release the connections owned by this client (the shared ones stay open)."""
+        if self._owns_session:
+            self._session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def search(self, query: str, num_results: int = 8) -> Optional[str]:
         """Search using SerpAPI (Google Search).
@@ -240,9 +783,19 @@ class WebSearchWithSerpAPI:
             Formatted search results, or None if failed
         """
         if not self.api_key:
-            logging.warning("SerpAPI key not available")
+            logger.warning("SerpAPI key not available")
             return None
         
+        key = (_cache_query(query), num_results)
+        hit, result = self._cache.get(key)
+        if hit:
+            return result
+        result = self._search(query, num_results)
+        self._cache.set(key, result)
+        return result
+    
+    def _search(self, query: str, num_results: int) -> Optional[str]:
+        """Uncached SerpAPI search (see search)."""
         try:
             params = {
                 "q": query,
@@ -253,10 +806,15 @@ class WebSearchWithSerpAPI:
                 "safe": "active"
             }
             
-            logging.info(f"SerpAPI request: {query}")
-            response = requests.get(self.base_url, params=params, timeout=20)
-            response.raise_for_status()
-            data = response.json()
+            logger.info("SerpAPI request: %s", query)
+            # El with devuelve la conexión al pool también cuando raise_for_status falla.
+            # Sin parseo incremental: el cuerpo (50-200 KB) se lee entero, pero el decoder
+            # por esquema solo construye los campos de _SerpResponse y saltea el resto en C,
+            # que es donde estaba el costo. Un parser en streaming (ijson) sumaba una
+            # dependencia y un segundo camino de parseo sin ahorrar objetos Python.
+            with self._session.get(self.base_url, params=params, timeout=self.timeout) as response:
+                response.raise_for_status()
+                data = _decode(_SERP_DECODER, response.content)
             
             results = []
             
@@ -264,76 +822,79 @@ class WebSearchWithSerpAPI:
             if 'answer_box' in data:
                 answer = data['answer_box']
                 if 'answer' in answer:
-                    results.append(f"💡 Respuesta directa: {answer['answer']}")
-                    if 'link' in answer:
-                        results.append(f"   🔗 Fuente: {answer['link']}")
-                    results.append("")  # Línea en blanco
+                    head = f"💡 Respuesta directa: {answer['answer']}"
                 elif 'snippet' in answer:
-                    results.append(f"💡 {answer['snippet']}")
-                    if 'link' in answer:
-                        results.append(f"   🔗 Fuente: {answer['link']}")
-                    results.append("")
+                    head = f"💡 {answer['snippet']}"
                 elif 'result' in answer:
-                    results.append(f"💡 {answer['result']}")
-                    if 'link' in answer:
-                        results.append(f"   🔗 Fuente: {answer['link']}")
-                    results.append("")
+                    head = f"💡 {answer['result']}"
+                else:
+                    head = None
+                if head is not None:
+                    # El "\n" final deja una línea en blanco antes de la siguiente sección
+                    source = f"\n   🔗 Fuente: {answer['link']}" if 'link' in answer else ""
+                    results.append(f"{head}{source}\n")
             
             # Extraer knowledge graph si existe
             if 'knowledge_graph' in data:
                 kg = data['knowledge_graph']
                 if 'description' in kg:
-                    results.append(f"📚 Información: {kg['description']}")
-                    if 'source' in kg and 'link' in kg['source']:
-                        results.append(f"   🔗 Fuente: {kg['source']['link']}")
-                    results.append("")
+                    source = f"\n   🔗 Fuente: {kg['source']['link']}" if 'source' in kg and 'link' in kg['source'] else ""
+                    results.append(f"📚 Información: {kg['description']}{source}\n")
             
             # Extraer resultados orgánicos
             if 'organic_results' in data and data['organic_results']:
                 results.append("📄 Resultados de búsqueda:")
-                for idx, result in enumerate(data['organic_results'][:num_results], 1):
-                    title = result.get('title', '')
-                    snippet = result.get('snippet', '')
-                    link = result.get('link', '')
-                    
-                    if title:
-                        results.append(f"\n{idx}. {title}")
-                        if snippet:
-                            results.append(f"   {snippet}")
-                        if link:
-                            results.append(f"   🔗 {link}")
+                results.extend(
+                    _format_entry(f"\n{idx}. {result['title']}", result.get('snippet', ''),
+                                  result.get('link', ''), "   ")
+                    for idx, result in enumerate(data['organic_results'][:num_results], 1)
+                    if result.get('title')
+                )
             
             # Extraer resultados de noticias si existen
             if 'news_results' in data and data['news_results']:
                 results.append("\n📰 Noticias relacionadas:")
-                for news in data['news_results'][:3]:
-                    title = news.get('title', '')
-                    snippet = news.get('snippet', '')
-                    link = news.get('link', '')
-                    if title:
-                        results.append(f"   • {title}")
-                        if snippet:
-                            results.append(f"     {snippet}")
-                        if link:
-                            results.append(f"     🔗 {link}")
+                results.extend(
+                    _format_entry(f"   • {news['title']}", news.get('snippet', ''),
+                                  news.get('link', ''), "     ")
+                    for news in data['news_results'][:3]
+                    if news.get('title')
+                )
             
             if results:
                 result_text = "\n".join(results)
-                logging.info(f"SerpAPI returned {len(results)} result lines")
+                logger.info("SerpAPI returned %d result blocks", len(results))
                 return result_text
             
-            logging.warning("SerpAPI returned no results")
+            logger.warning("SerpAPI returned no results")
             return None
             
         except requests.exceptions.RequestException as e:
-            logging.error(f"SerpAPI request error: {e}")
+            logger.error("SerpAPI request error: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                logging.error(f"SerpAPI response status: {e.response.status_code}")
-                logging.error(f"SerpAPI response: {e.response.text[:200]}")
+                logger.error("SerpAPI response status: %s", e.response.status_code)
+                if e.response.status_code == 429:
+                    # Cuota agotada aun después de los reintentos: informar cuándo vuelve a aceptar
+                    logger.error("SerpAPI rate limited, Retry-After: %s", e.response.headers.get('Retry-After'))
+                if logger.isEnabledFor(logging.ERROR):
+                    # Decodificar el cuerpo solo si el registro se va a emitir
+                    logger.error("SerpAPI response: %s", e.response.text[:200])
             return None
         except Exception as e:
-            logging.error(f"Error using SerpAPI search: {e}")
-            import traceback
-            logging.error(traceback.format_exc())
+            # exc_info solo formatea el traceback si algún handler emite el registro
+            logger.error("Error using SerpAPI search: %s", e, exc_info=True)
             return None
+    
+    async def search_async(self, query: str, num_results: int = 8) -> Optional[str]:
+        """Async variant of search() that runs on the shared thread pool.
+        
+        Args:
+            query: Search query string
+            num_results: Number of results to return
+            
+        Returns:
+            Formatted search results, or None if failed
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_POOL, self.search, query, num_results)
 